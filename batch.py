@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+"""
+	CopyLeft 2021 Michael Rouves
+
+	This file is part of Pygame-DoodleJump.
+	Pygame-DoodleJump is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+
+	Pygame-DoodleJump is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+	GNU Affero General Public License for more details.
+
+	You should have received a copy of the GNU Affero General Public License
+	along with Pygame-DoodleJump. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+from time import perf_counter
+from pygame import Rect
+import numpy as np
+
+from level import Bonus
+import settings as config
+
+
+
+# pygame versions disagree on how a float assigned to a Rect attribute
+# becomes an int (truncation or rounding half away from zero): probe it once
+# so the batch engine coerces positions exactly like Player.update does.
+_probe = Rect(0,0,0,0)
+_probe.x = .5
+RECT_ROUNDS = _probe.x == 1
+del _probe
+
+
+def rect_int(values:np.ndarray) -> np.ndarray:
+	""" Converts float positions like a pygame.Rect attribute assignment.
+	:param values numpy.ndarray: the float positions.
+	:return numpy.ndarray: int64 positions.
+	"""
+	if RECT_ROUNDS:
+		values = np.where(values<0, np.ceil(values-.5), np.floor(values+.5))
+	else:
+		values = np.trunc(values)
+	return values.astype(np.int64)
+
+
+
+class BatchWorld:
+	"""
+	A class to represent N headless games stepped together.
+
+	State is stored as struct-of-arrays NumPy buffers (one row per game)
+	and every step applies the same rules as Player.update, Level.update,
+	Camera.update and offscreen platform removal for all games.
+	Dead games are frozen until reset.
+	"""
+
+	def __init__(self, n:int, seed:int=None,
+			max_platforms:int=config.MAX_PLATFORM_NUMBER):
+		self.n = n
+		self.max_platforms = max_platforms
+		self.rng = np.random.default_rng(seed)
+
+		# constants (same as Player, Level & Camera)
+		self.player_size = config.PLAYER_SIZE
+		self.platform_size = config.PLATFORM_SIZE
+		self.distance_min = min(config.PLATFORM_DISTANCE_GAP)
+		self.distance_max = max(config.PLATFORM_DISTANCE_GAP)
+		self.bonus_platform_chance = config.BONUS_SPAWN_CHANCE
+		self.breakable_platform_chance = config.BREAKABLE_PLATFORM_CHANCE
+		self.camera_center = config.YWIN//2
+		self.camera_lerp = config.CAMERA_LERP
+		self.start_pos = (
+			int(config.HALF_XWIN - config.PLAYER_SIZE[0]/2),
+			int(config.HALF_YWIN + config.HALF_YWIN/2))
+		self.base_pos = (
+			int(config.HALF_XWIN - self.platform_size[0]//2),
+			int(config.HALF_YWIN + config.YWIN/3))
+
+		# Player buffers
+		self.x = np.full(n, self.start_pos[0], np.int64)
+		self.y = np.full(n, self.start_pos[1], np.int64)
+		self.vx = np.zeros(n)
+		self.vy = np.zeros(n)
+		self.input = np.zeros(n, np.int8)
+		self.dead = np.zeros(n, bool)
+		self.death_step = np.full(n, -1, np.int64)
+
+		# Camera buffers
+		self.camera_y = np.zeros(n, np.int64)
+		self.maxheight = np.full(n, self.camera_center, np.int64)
+
+		# Level buffers (one slot per platform, ordered by spawn sequence)
+		shape = (n, max_platforms)
+		self.plt_x = np.zeros(shape, np.int64)
+		self.plt_y = np.zeros(shape, np.int64)
+		self.plt_alive = np.zeros(shape, bool)
+		self.plt_bonus = np.zeros(shape, bool)
+		self.plt_breakable = np.zeros(shape, bool)
+		self.plt_seq = np.zeros(shape, np.int64)
+		self._to_remove = np.zeros(shape, bool)
+		self._seq = 0
+		self.steps = 0
+
+	@property
+	def score(self) -> np.ndarray:
+		return -self.camera_y//50
+
+
+	def reset(self, mask:np.ndarray=None) -> None:
+		""" Restarts selected games like Game.reset (after player death).
+		:param mask numpy.ndarray: bool mask of games to reset (default: all).
+		"""
+		if mask is None: mask = np.ones(self.n, bool)
+		self.x[mask], self.y[mask] = self.start_pos
+		self.vx[mask] = self.vy[mask] = 0
+		self.dead[mask] = False
+		self.death_step[mask] = -1
+		self.camera_y[mask] = 0
+		self.maxheight[mask] = self.camera_center
+		# only the base platform remains
+		self.plt_alive[mask] = False
+		self._to_remove[mask] = False
+		games = np.flatnonzero(mask)
+		self._spawn_base(games, np.zeros(len(games), np.int64))
+
+
+	def _spawn_base(self, games:np.ndarray, slots:np.ndarray) -> None:
+		self._set_platform(games, slots, *self.base_pos, False, False)
+
+
+	def _set_platform(self, games, slots, x, y, bonus, breakable) -> None:
+		self.plt_x[games,slots] = x
+		self.plt_y[games,slots] = y
+		self.plt_bonus[games,slots] = bonus & ~np.asarray(breakable)
+		self.plt_breakable[games,slots] = breakable
+		self.plt_alive[games,slots] = True
+		self.plt_seq[games,slots] = self._seq + np.arange(len(games))
+		self._seq += len(games)
+
+
+	def _draw_layout(self, count:int) -> tuple:
+		""" Draws random values for count new platforms (Level.create_platform).
+		:return tuple: (y offsets, x positions, has bonus, is breakable)
+		"""
+		randint = self.rng.integers
+		offset = randint(self.distance_min, self.distance_max+1, count)
+		x = randint(0, config.XWIN-self.platform_size[0]+1, count)
+		bonus = randint(0, self.bonus_platform_chance+1, count) == 0
+		breakable = randint(0, self.breakable_platform_chance+1, count) == 0
+		return offset, x, bonus, breakable
+
+
+	def _generation(self) -> None:
+		" Fills every game up to max_platforms (Level._generation)."
+		while True:
+			count = self.plt_alive.sum(axis=1)
+			games = np.flatnonzero(count < self.max_platforms)
+			if not len(games): return
+			alive = self.plt_alive[games]
+			slots = np.argmin(alive, axis=1)# first free slot
+			# empty level: add the base platform first
+			empty = count[games] == 0
+			if empty.any():
+				self._spawn_base(games[empty], slots[empty])
+				games, slots, alive = games[~empty], slots[~empty], alive[~empty]
+				if not len(games): continue
+			last = np.argmax(np.where(alive, self.plt_seq[games], -1), axis=1)
+			offset, x, bonus, breakable = self._draw_layout(len(games))
+			y = self.plt_y[games,last] - offset
+			self._set_platform(games, slots, x, y, bonus, breakable)
+
+
+	def _collisions(self, active:np.ndarray) -> None:
+		""" Resolves first collision (in spawn order) for falling players.
+		:param active numpy.ndarray: bool mask of games to check.
+		"""
+		games = np.flatnonzero(active & (self.vy > .5))
+		if not len(games): return
+		pw,ph = self.player_size
+		w,h = self.platform_size
+		x,y = self.x[games,None], self.y[games,None]
+		plx,ply = self.plt_x[games], self.plt_y[games]
+		alive = self.plt_alive[games]
+		# platform's bonus position (Bonus._get_inital_pos)
+		bx = plx + w//2 - Bonus.WIDTH//2
+		by = ply - Bonus.HEIGHT
+
+		hit_plt = alive & (x<plx+w) & (x+pw>plx) & (y<ply+h) & (y+ph>ply)
+		hit_bonus = alive & self.plt_bonus[games] & (
+			(x<bx+Bonus.WIDTH) & (x+pw>bx) & (y<by+Bonus.HEIGHT) & (y+ph>by))
+		hit = hit_plt | hit_bonus
+		touched = hit.any(axis=1)
+		games = games[touched]
+		if not len(games): return
+		seq = np.where(hit[touched], self.plt_seq[games], np.iinfo(np.int64).max)
+		slot = np.argmin(seq, axis=1)
+		on_bonus = hit_bonus[touched, slot]
+		top = self.plt_y[games,slot] - np.where(on_bonus, Bonus.HEIGHT, 0)
+
+		self.y[games] = top - ph
+		self.vy[games] = np.where(on_bonus,
+			-config.PLAYER_BONUS_JUMPFORCE, -config.PLAYER_JUMPFORCE)
+		broken = ~on_bonus & self.plt_breakable[games,slot]
+		self._to_remove[games[broken], slot[broken]] = True
+
+
+	def step(self, inputs:np.ndarray=None) -> None:
+		""" Advances every game by one frame.
+		:param inputs numpy.ndarray: direction held per game (-1, 0 or 1),
+			translated like Player.handle_event key presses/releases.
+		"""
+		if inputs is not None:
+			inputs = np.asarray(inputs, np.int8)
+			press = (inputs!=0) & (inputs!=self.input)
+			self.vx[press] = inputs[press]*config.PLAYER_START_SPEED
+			self.input[press] = inputs[press]
+			self.input[(inputs==0) & (self.input!=0)] = 0
+
+		# ----------- Player.update -----------
+		died = ~self.dead & (self.y-self.camera_y > config.YWIN*2)
+		self.dead |= died
+		self.death_step[died] = self.steps+1# (steps done, like World.death_step)
+		active = ~self.dead
+
+		vy = self.vy + config.GRAVITY
+		vx = np.where(self.input!=0, self.vx + self.input*config.PLAYER_ACCEL,
+			np.round(self.vx - np.sign(self.vx)*config.PLAYER_DECCEL))
+		vx = np.where((self.input==0) & (self.vx==0), self.vx, vx)
+		maxspeed, maxfall = config.PLAYER_MAX_SPEED, config.PLAYER_MAX_FALL_SPEED
+		vy = np.round(np.clip(vy, -maxfall, maxfall), 2)
+		vx = np.round(np.clip(vx, -maxspeed, maxspeed), 2)
+		self.vx = np.where(active, vx, self.vx)
+		self.vy = np.where(active, vy, self.vy)
+
+		modulo = config.XWIN - self.player_size[0]
+		self.x = np.where(active, rect_int(np.mod(self.x+self.vx, modulo)), self.x)
+		self.y = np.where(active, rect_int(self.y+self.vy), self.y)
+		self._collisions(active)
+
+		# ----------- Level.update -----------
+		self.plt_alive &= ~self._to_remove
+		self._to_remove[:] = False
+		self._generation()
+
+		# ----------- Camera.update -----------
+		self.maxheight = np.where(active & (self.y<self.maxheight),
+			self.y, self.maxheight)
+		speed = ((self.camera_y+self.camera_center)-self.maxheight)/self.camera_lerp
+		self.camera_y = np.where(active,
+			rect_int(self.camera_y-speed), self.camera_y)
+
+		# ----------- offscreen removal (next Level.update) -----------
+		self._to_remove |= self.plt_alive & (
+			self.plt_y-self.camera_y[:,None]+self.platform_size[1] > config.YWIN)
+		self.steps += 1
+
+
+	def run(self, steps:int, policy=None) -> None:
+		""" Steps every game a given number of frames.
+		:param steps int: number of frames to simulate.
+		:param policy callable: optional policy(world) -> inputs array.
+		"""
+		for _ in range(steps):
+			self.step(policy(self) if policy else None)
+
+
+
+def check(seeds:int=200, steps:int=600) -> list:
+	""" Plays each seed with World (Player, Level, Camera) and a single game
+	BatchWorld fed the same level random draws (Level's Random) and the
+	same random inputs, comparing both after every step.
+	:return list: (seed, step, what) of the first mismatch of each seed.
+	"""
+	from random import Random
+	from world import World
+	from inputs import direction_events
+	mismatches = []
+	for seed in range(seeds):
+		world,batch = World(seed,streaming=False),BatchWorld(1)
+		level_rng = Random(world.lvl.seed)
+		def draw_layout(count:int, randint=level_rng.randint) -> tuple:
+			# same draws, same order as Level.create_platform
+			return tuple(np.array([f() for _ in range(count)]) for f in (
+				lambda: randint(batch.distance_min,batch.distance_max),
+				lambda: randint(0,config.XWIN-batch.platform_size[0]),
+				lambda: not randint(0,batch.bonus_platform_chance),
+				lambda: not randint(0,batch.breakable_platform_chance)))
+		batch._draw_layout = draw_layout
+		inputs,direction = Random(seed),0
+		for step in range(steps):
+			if inputs.random() < .05: direction = inputs.choice((-1,0,1))
+			for event in direction_events(world.player._input,direction):
+				world.handle_event(event)
+			world.update()
+			batch.step([direction])
+			player = world.player
+			for what,expected,value in (
+					("position",player.rect.topleft,(batch.x[0],batch.y[0])),
+					("velocity",tuple(player._velocity),(batch.vx[0],batch.vy[0])),
+					("score",world.score,batch.score[0]),
+					("death",(player.dead,world.death_step),
+						(batch.dead[0],batch.death_step[0]))):
+				if expected != value:
+					mismatches.append((seed,step,what))
+					break
+			else:
+				continue
+			break
+		world.close()
+	return mismatches
+
+
+def benchmark(sizes=(1,10,100,1000,10000), steps:int=600, seed:int=0) -> dict:
+	""" Measures steps per second of BatchWorld for several batch sizes.
+	:return dict: {batch size: (steps/s, game steps/s)}
+	"""
+	results = {}
+	for n in sizes:
+		world = BatchWorld(n, seed)
+		rng = np.random.default_rng(seed)
+		inputs = rng.integers(-1, 2, (steps, n))
+		start = perf_counter()
+		for i in range(steps):
+			world.step(inputs[i])
+		elapsed = perf_counter() - start
+		results[n] = (steps/elapsed, steps*n/elapsed)
+	return results
+
+
+
+
+if __name__ == "__main__":
+	seeds = 200
+	mismatches = check(seeds)
+	print(f"same results as World: {seeds-len(mismatches)}/{seeds} seeds",
+		*(f"seed {seed}: {what} differs at step {step}"
+			for seed,step,what in mismatches),sep="\n")
+	assert not mismatches, "BatchWorld differs from World !"
+	for n,(sps,gsps) in benchmark().items():
+		print(f"{n:>6} games: {sps:10.1f} steps/s {gsps:14.1f} game-steps/s")
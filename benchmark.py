@@ -0,0 +1,792 @@
+# -*- coding: utf-8 -*-
+"""
+	CopyLeft 2021 Michael Rouves
+
+	This file is part of Pygame-DoodleJump.
+	Pygame-DoodleJump is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+
+	Pygame-DoodleJump is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+	GNU Affero General Public License for more details.
+
+	You should have received a copy of the GNU Affero General Public License
+	along with Pygame-DoodleJump. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+import os
+# headless by default: must be set before pygame creates the display
+os.environ.setdefault("SDL_VIDEODRIVER","dummy")
+
+from time import perf_counter
+from random import Random
+from argparse import ArgumentParser
+from contextlib import contextmanager
+import tracemalloc, platform, subprocess, tempfile, json, sys, time
+from pygame.sprite import collide_rect
+from pygame.event import Event
+import numpy as np
+import pygame
+from pygame import Surface
+
+from main import Game
+from world import World
+from hud import GlyphAtlas, NumberText
+from tournament import apply_direction, greedy
+from observation import Observer
+from capture import FrameCapture
+import levelgen
+from inputs import filter_events, direction_events
+from camera import Camera
+from level import Level, Platform
+from sprite import SURFACES
+from player import Player
+import settings as config
+
+
+
+def setup(max_platforms:int=config.MAX_PLATFORM_NUMBER) -> tuple:
+	""" Creates a headless world (camera, level and player).
+	:param max_platforms int: number of platforms kept by the level.
+	:return tuple: (camera, level, player)
+	"""
+	if not pygame.display.get_surface():
+		pygame.display.set_mode((1,1))
+	world = World()
+	world.lvl.max_platforms = max_platforms
+	world.lvl.reset()
+	world.lvl.update()
+	return world.camera,world.lvl,world.player
+
+
+def _linear_collisions(player:Player, lvl:Level) -> None:
+	" Reference implementation: tests every platform (no spatial index)."
+	for plat in lvl.platforms:
+		if player._velocity.y > .5:
+			if plat.bonus and collide_rect(player,plat.bonus):
+				player.onCollide(plat.bonus)
+			if collide_rect(player,plat):
+				player.onCollide(plat)
+
+
+def bench_collisions(counts=(10,100,1000), calls:int=5000) -> dict:
+	""" Times Player.collisions while the level holds 100x more platforms.
+	The player is placed at heights spread over the level, falling.
+	:return dict: {platform count: (indexed µs/call, linear µs/call)}
+	"""
+	results = {}
+	for count in counts:
+		_,lvl,player = setup(count)
+		top = lvl.platforms.last.rect.y
+		bottom = config.YWIN
+		positions = [bottom - (bottom-top)*i//calls for i in range(calls)]
+		timings = []
+		for collisions in (player.collisions,
+				lambda:_linear_collisions(player,lvl)):
+			elapsed = 0
+			for y in positions:
+				player.rect.y = y
+				player._velocity.y = 10
+				start = perf_counter()
+				collisions()
+				elapsed += perf_counter()-start
+			timings.append(elapsed/calls*1e6)
+		results[count] = tuple(timings)
+	return results
+
+
+
+def _render_frames(frames:int) -> dict:
+	""" Times Game._render_loop with full and dirty-rect rendering, the
+	game played by steer() (scrolling, restarts) with the current driver.
+	:return dict: {mode: (ms/frame, share of full redraws,
+		share of the screen pushed to the display per frame)}
+	"""
+	results = {}
+	for dirty in (False,True):
+		game = Game(dirty_rects=dirty,seed=0)
+		elapsed = 0
+		for _ in range(frames):
+			steer(game)
+			game._update_loop()
+			start = perf_counter()
+			game._render_loop()
+			elapsed += perf_counter()-start
+		if dirty:
+			renderer = game.renderer
+			full = renderer.full_frames/frames
+			area = renderer.updated_area/frames/(config.XWIN*config.YWIN)
+		else:
+			full = area = 1.
+		results["dirty" if dirty else "full"] = (elapsed/frames*1e3,full,area)
+	return results
+
+
+def bench_render(frames:int=1000, drivers=("dummy","offscreen")) -> dict:
+	""" Full and dirty-rect rendering under several SDL video drivers
+	(fresh interpreters). The dummy driver skips display updates, the
+	offscreen one keeps a software window surface; a real display is used
+	too when DISPLAY is set (x11).
+	:return dict: {(driver, mode): (ms/frame, share of full redraws,
+		share of the screen pushed per frame)}
+	"""
+	if os.environ.get("DISPLAY"): drivers += ("x11",)
+	code = ("import benchmark,json; "
+		f"print(json.dumps(benchmark._render_frames({frames})))")
+	results = {}
+	for driver in drivers:
+		env = dict(os.environ,PYGAME_HIDE_SUPPORT_PROMPT="1",
+			SDL_VIDEODRIVER=driver)
+		output = subprocess.run([sys.executable,"-c",code],env=env,check=True,
+			text=True,cwd=os.path.dirname(os.path.abspath(__file__)),
+			capture_output=True)
+		for mode,result in json.loads(output.stdout.splitlines()[-1]).items():
+			results[(driver,mode)] = tuple(result)
+	return results
+
+
+def bench_spawn(count:int=1000) -> tuple:
+	""" Times Platform construction and measures surface memory.
+	:return tuple: (µs/platform, cached surfaces, surface KiB)
+	"""
+	setup()
+	w,h = config.PLATFORM_SIZE
+	start = perf_counter()
+	platforms = [Platform(0,-i*20,w,h,breakable=i%2) for i in range(count)]
+	elapsed = perf_counter()-start
+	result = (elapsed/count*1e6, len(SURFACES), SURFACES.nbytes/1024)
+	del platforms
+	return result
+
+
+def bench_hud(frames:int=6000, frames_per_meter:int=10) -> dict:
+	""" Times the score text update done each frame by Game._update_loop.
+	Score grows by one every frames_per_meter frames (like a climbing player).
+	:return dict: {method: (µs/frame, surfaces allocated, peak traced KiB)}
+	"""
+	atlas_text = NumberText(GlyphAtlas(config.SMALL_FONT,config.GRAY)," m")
+	methods = {
+		"font.render": lambda s: config.SMALL_FONT.render(
+			str(s)+" m",1,config.GRAY),
+		"glyph atlas": atlas_text.render}
+	results = {}
+	for name,render in methods.items():
+		last,allocated,elapsed = None,0,0
+		tracemalloc.start()
+		for frame in range(frames):
+			start = perf_counter()
+			surface = render(frame//frames_per_meter)
+			elapsed += perf_counter()-start
+			allocated += surface is not last
+			last = surface
+		peak = tracemalloc.get_traced_memory()[1]
+		tracemalloc.stop()
+		results[name] = (elapsed/frames*1e6, allocated, peak/1024)
+	return results
+
+
+def bench_streaming(count:int=1000, gap=(1,3), scroll:int=20,
+		frames:int=300) -> dict:
+	""" Stress test of level generation: very dense platforms while the
+	camera scrolls (about ten platforms retired per frame). Frames are
+	paced to config.TIMESTEP (the streaming worker runs meanwhile, like in
+	the game) and include the first one, which fills the whole level in
+	synchronous mode (streaming spawns config.STREAM_SPAWN_BUDGET platforms
+	per frame). Fill latency: time until the level is first full.
+	:return dict: {mode: (mean ms, p99 ms, max ms, mean missing platforms,
+		fill latency ms (None: never full))}
+	"""
+	gap_setting,config.PLATFORM_DISTANCE_GAP = config.PLATFORM_DISTANCE_GAP,gap
+	setup()
+	results = {}
+	for streaming in (False,True):
+		camera = Camera()
+		lvl = Level(seed=0,streaming=streaming,camera=camera)
+		lvl.max_platforms = count
+		lvl.reset()
+		durations,missing,filled = [],0,None
+		begin = next_frame = perf_counter()
+		for _ in range(frames):
+			camera.state.y -= scroll
+			start = perf_counter()
+			lvl.update()
+			end = perf_counter()
+			durations.append(end-start)
+			missing += count-len(lvl.platforms)
+			if filled is None and len(lvl.platforms) == count:
+				filled = (end-begin)*1e3
+			next_frame += config.TIMESTEP
+			time.sleep(max(next_frame-perf_counter(),0))
+		if lvl.streamer: lvl.streamer.stop()
+		stats = summarize(durations)
+		results["streaming" if streaming else "sync"] = (stats["mean"]/1e3,
+			stats["p99"]/1e3,max(durations)*1e3,missing/frames,filled)
+	config.PLATFORM_DISTANCE_GAP = gap_setting
+	return results
+
+
+def ks_distance(a, b) -> float:
+	" Two-sample Kolmogorov-Smirnov statistic (largest gap between CDFs)."
+	a,b = np.sort(a),np.sort(b)
+	values = np.concatenate((a,b))
+	return float(np.abs(np.searchsorted(a,values,"right")/len(a)
+		-np.searchsorted(b,values,"right")/len(b)).max())
+
+
+def bench_timestep(seeds:int=200, frames:int=3000, hold:int=8) -> dict:
+	""" Coarse timesteps (swept collisions): long greedy agent episodes
+	(direction chosen every hold frames, the same frames at every step
+	size) played at several frames per step. Score and death frame
+	distributions must match the single frame ones (two-sample
+	Kolmogorov-Smirnov test at 1%).
+	:return dict: {frames per step: (mean score, deaths, mean death frame,
+		simulated frames/s, KS score, KS death frame)}
+	"""
+	results,base = {},None
+	critical = 1.628*(2/seeds)**.5# (KS, alpha = .01)
+	for dt in (1,2,4,8):
+		assert not hold%dt, "Agent decisions must fall on steps !"
+		scores,deaths,elapsed = [],[],0.
+		for seed in range(seeds):
+			game = Game(seed=seed,headless=True)
+			game.player.swept = True
+			start = perf_counter()
+			for frame in range(0,frames,dt):
+				if not frame%hold:
+					apply_direction(game,greedy(game))
+				game._update_loop(dt)
+				if game.player.dead: break
+			elapsed += perf_counter()-start
+			scores.append(game.score)
+			# (the dying step only checks death: frames moved before it + 1)
+			deaths.append((game.steps-1)*dt+1 if game.player.dead else frames)
+		if base is None: base = (scores,deaths)
+		# death is checked before each step: single frame deaths on its grid
+		grid = [-(-(d-1)//dt)*dt+1 if d < frames else d for d in base[1]]
+		ks_score,ks_death = ks_distance(base[0],scores),ks_distance(grid,deaths)
+		assert ks_score < critical and ks_death < critical, \
+			f"{dt} frames/step: score or death distribution differs !"
+		results[dt] = (sum(scores)/seeds,sum(d < frames for d in deaths),
+			sum(deaths)/seeds,sum(deaths)/elapsed,ks_score,ks_death)
+	return results
+
+
+def bench_worlds(count:int=1000, steps:int=600) -> tuple:
+	""" Many independent worlds in one process, stepped in turn with
+	scripted random inputs (restarted when dead).
+	:return tuple: (KiB/world, µs/world step)
+	"""
+	tracemalloc.start()
+	worlds = [World(seed=i) for i in range(count)]
+	for world in worlds:
+		world.update()# (first generation)
+	size,_ = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	inputs = Random(0)
+	elapsed = 0.
+	for step in range(steps):
+		start = perf_counter()
+		for world in worlds:
+			if world.player.dead:
+				world.reset()
+			if not step%16:
+				apply_direction(world,inputs.choice((-1,0,1)))
+			world.update()
+		elapsed += perf_counter()-start
+	for world in worlds:
+		world.close()
+	return size/count/1024,elapsed/(steps*count)*1e6
+
+
+def bench_snapshot(counts=(10,100,1000), runs:int=2000) -> dict:
+	""" World.snapshot and World.restore throughput (restoring into another
+	world, pools warm).
+	:return dict: {platforms: (snapshots/s, restores/s, bytes)}
+	"""
+	results = {}
+	for count in counts:
+		world = World(seed=1)
+		world.lvl.max_platforms = count
+		world.update()
+		data = world.snapshot()
+		other = World(seed=2)
+		other.lvl.max_platforms = count
+		other.restore(data)# (warms the sprite pools)
+		start = perf_counter()
+		for _ in range(runs):
+			world.snapshot()
+		snapshot = perf_counter()-start
+		start = perf_counter()
+		for _ in range(runs):
+			other.restore(data)
+		restore = perf_counter()-start
+		results[count] = (runs/snapshot,runs/restore,len(data))
+	return results
+
+
+def bench_capture(frames:int=120) -> dict:
+	""" Frame recording cost on the game loop, frames paced at config.FPS:
+	synchronous pygame.image.save against FrameCapture (drop policy).
+	:return dict: {case: (µs/frame p50, max, dropped frames)}
+	"""
+	game = Game(seed=0)
+	results = {}
+	with tempfile.TemporaryDirectory() as directory:
+		cases = {"sync png":None}
+		for format in ("png","raw","zlib"):
+			cases[format] = format
+		for name,format in cases.items():
+			path = os.path.join(directory,name.replace(" ","_"))
+			if format:
+				capture = FrameCapture(path,format=format,policy="drop")
+			else:
+				capture = None
+				os.makedirs(path)
+			durations = []
+			for frame in range(frames):
+				game._update_loop()
+				game._render_loop()
+				start = perf_counter()
+				if capture:
+					capture.capture(game.window)
+				else:
+					pygame.image.save(game.window,
+						os.path.join(path,f"frame_{frame:06d}.png"))
+				durations.append(perf_counter()-start)
+				time.sleep(max(config.TIMESTEP-durations[-1],0))
+			if capture: capture.close()
+			durations.sort()
+			results[name] = (durations[len(durations)//2]*1e6,durations[-1]*1e6,
+				capture.dropped if capture else 0)
+	return results
+
+
+def bench_pacing(steps:int=180, loads=(0,.025,.1)) -> dict:
+	""" Game.run pacing (fresh interpreters) with extra render time,
+	with and without render frame-skip.
+	:param loads tuple: seconds added to each render (slow host).
+	:return dict: {(mode, load ms, frame skip): (steps/s, stats)}
+	"""
+	code = ("import main,time,json; game = main.Game(seed=0); "
+		"render = game._render_loop; game._render_loop = lambda alpha: "
+		"(render(alpha),time.sleep({load})); game.pacer = main.FramePacer("
+		"mode={mode!r},max_skip={skip}); start = time.perf_counter(); "
+		"game.run(max_steps={steps}); elapsed = time.perf_counter()-start; "
+		"print(json.dumps([game.steps/elapsed,game.pacer.stats()]))")
+	cases = [(mode,load,config.MAX_FRAME_SKIP) for mode in ("tick","busy","hybrid")
+		for load in loads]
+	cases += [("tick",load,0) for load in loads if load]
+	env = dict(os.environ,PYGAME_HIDE_SUPPORT_PROMPT="1")
+	results = {}
+	for mode,load,skip in cases:
+		output = subprocess.run([sys.executable,"-c",code.format(mode=mode,
+			load=load,skip=skip,steps=steps)],env=env,check=True,text=True,
+			cwd=os.path.dirname(os.path.abspath(__file__)),capture_output=True)
+		rate,stats = json.loads(output.stdout.splitlines()[-1])
+		results[(mode,load*1e3,skip)] = (rate,stats)
+	return results
+
+
+def bench_levelgen(layouts:int=1<<14, platforms:int=64) -> dict:
+	""" Platform layouts per second: Level.create_platform (sprites, no
+	validation) against levelgen's NumPy generator, with reachability.
+	:return dict: {case: platforms/s}
+	"""
+	_,lvl,_ = setup(platforms)
+	count = layouts*platforms//64
+	start = perf_counter()
+	for _ in range(count//platforms):
+		lvl.reset()
+		lvl.update()
+	results = {"Level.create_platform":count/(perf_counter()-start)}
+	levelgen.envelope(),levelgen.envelope(config.PLAYER_BONUS_JUMPFORCE)
+	rng = np.random.default_rng(0)
+	start = perf_counter()
+	generated = levelgen.generate(rng,layouts,platforms)
+	results["levelgen.generate"] = layouts*platforms/(perf_counter()-start)
+	start = perf_counter()
+	levelgen.reachability(generated)
+	results["levelgen.reachability"] = layouts*platforms/(perf_counter()-start)
+	return results
+
+
+def bench_events(frames:int=2000, motions:int=20) -> dict:
+	""" Event loop cost per frame (µs) with mouse motion noise (motions
+	events and one key press per frame), all event types queued or only
+	the game's ones (inputs.filter_events).
+	"""
+	setup()
+	results = {}
+	for name,filtered in (("all types",False),("filtered",True)):
+		if filtered: filter_events()
+		else: pygame.event.set_allowed(None)
+		elapsed = 0.
+		for _ in range(frames):
+			for i in range(motions):
+				pygame.event.post(Event(pygame.MOUSEMOTION,pos=(i,i),rel=(1,1),
+					buttons=(0,0,0)))
+			pygame.event.post(Event(pygame.KEYDOWN,key=pygame.K_LEFT))
+			start = perf_counter()
+			for event in pygame.event.get():
+				pass
+			elapsed += perf_counter()-start
+		results[name] = elapsed/frames*1e6
+	pygame.event.set_allowed(None)
+	return results
+
+
+def bench_advance(seeds:int=30, frames:int=5000) -> dict:
+	""" Headless episodes with sparse inputs (a direction every 20 to 120
+	steps, until death or frames): World.update each step against
+	World.advance between inputs.
+	:return dict: {mode: (World.update calls/episode, ms/episode)}
+	"""
+	results = {}
+	for mode in ("per frame","event-driven"):
+		calls,elapsed = 0,0.
+		for seed in range(seeds):
+			rng,world = Random(seed),World(seed)
+			start = perf_counter()
+			while world.steps < frames and not world.player.dead:
+				until = min(world.steps+rng.randint(20,120),frames)
+				if mode == "per frame":
+					calls += until-world.steps
+					while world.steps < until: world.update()
+				else:
+					calls += world.advance(until-world.steps)
+				for event in direction_events(world.player._input,
+						rng.choice((-1,0,1))):
+					world.handle_event(event)
+			elapsed += perf_counter()-start
+		results[mode] = (calls/seeds,elapsed/seeds*1e3)
+	return results
+
+
+def bench_memory(count:int=10000) -> dict:
+	""" Memory per sprite (bytes): allocated by creating count of them
+	(surfaces are shared, see SurfaceCache).
+	"""
+	_,lvl,_ = setup()
+	cases = {
+		"Platform":lambda i: Platform(i%500,-i,*config.PLATFORM_SIZE),
+		"Platform+Bonus":lambda i: Platform(i%500,-i,*config.PLATFORM_SIZE,
+			initial_bonus=True),
+	}
+	results = {}
+	for name,create in cases.items():
+		create(0)# (shared surface cached)
+		tracemalloc.start()
+		sprites = [create(i) for i in range(count)]
+		size,_ = tracemalloc.get_traced_memory()
+		tracemalloc.stop()
+		results[name] = (size-sys.getsizeof(sprites))/count
+		del sprites
+	return results
+
+
+def bench_observation(steps:int=1000) -> dict:
+	""" Observation cost per step (µs), against copying the frame with
+	pygame.image.tostring and building feature lists from Level.platforms.
+	"""
+	game = Game(seed=0,headless=True)
+	window = Surface(config.DISPLAY)
+	def baseline():
+		window.fill(config.WHITE)
+		game.lvl.draw(window)
+		game.player.draw(window)
+		pygame.image.tostring(window,"RGB")
+		y = game.camera.state.y
+		return [[p.rect.x,p.rect.y-y,p.breakable] for p in game.lvl.platforms]
+	cases = {"tostring+lists":baseline}
+	for size in (None,(84,84)):
+		observer = Observer(game,size)
+		name = "x".join(map(str,observer.size))
+		cases[f"pixels {name}"] = observer.pixels
+	cases["features"] = observer.features
+	results = {}
+	for name,observe in cases.items():
+		elapsed = 0.
+		for _ in range(steps):
+			if game.player.dead: game.reset()
+			apply_direction(game,greedy(game))
+			game._update_loop()
+			start = perf_counter()
+			observe()
+			elapsed += perf_counter()-start
+		results[name] = elapsed/steps*1e6
+	return results
+
+
+def bench_startup(runs:int=5) -> dict:
+	""" Measures fresh interpreter start-up times (best of runs).
+	:return dict: {case: ms}
+	"""
+	cases = {
+		"import settings":"import settings",
+		"import main":"import main",
+		"first frame":"import main; game = main.Game(); game._event_loop(); "
+			"game._update_loop(); game._render_loop()"}
+	env = dict(os.environ,PYGAME_HIDE_SUPPORT_PROMPT="1")
+	results = {}
+	for name,code in cases.items():
+		best = float("inf")
+		for _ in range(runs):
+			start = perf_counter()
+			subprocess.run([sys.executable,"-c",code],env=env,check=True,
+				cwd=os.path.dirname(os.path.abspath(__file__)),capture_output=True)
+			best = min(best,perf_counter()-start)
+		results[name] = best*1e3
+	return results
+
+
+# ======================= Hot paths suite =======================
+TARGETS = (
+	(Player,"update"),
+	(Player,"collisions"),
+	(Level,"update"),
+	(Level,"blit_list"),
+	(Player,"blit_item"),
+)
+
+
+def steer(game:Game) -> None:
+	""" Scripted input: the greedy tournament agent (deterministic for a
+	given level seed). Restarts the game when the player is dead.
+	"""
+	if game.player.dead:
+		return game.handle_event(Event(pygame.KEYDOWN,key=pygame.K_RETURN))
+	apply_direction(game,greedy(game))
+
+
+@contextmanager
+def _timed(totals:dict):
+	""" Wraps TARGETS methods so their durations add up in totals.
+	(class attributes are patched, then restored)
+	"""
+	def wrap(name,method):
+		def timed(*args,**kwargs):
+			start = perf_counter()
+			result = method(*args,**kwargs)
+			totals[name] += perf_counter()-start
+			return result
+		return timed
+	originals = []
+	for cls,attr in TARGETS:
+		name = f"{cls.__name__}.{attr}"
+		totals[name] = 0.
+		originals.append((cls,attr,cls.__dict__[attr]))
+		setattr(cls,attr,wrap(name,getattr(cls,attr)))
+	try:
+		yield totals
+	finally:
+		for cls,attr,method in originals:
+			setattr(cls,attr,method)
+
+
+def _game(count:int, seed:int) -> Game:
+	game = Game(seed=seed)
+	game.lvl.max_platforms = count
+	game.lvl.reset()
+	return game
+
+
+def profile_hot_paths(count:int, frames:int=600, seed:int=0) -> dict:
+	""" Times hot paths for each frame of a scripted game.
+	:param count int: number of platforms kept by the level.
+	:param frames int: number of frames (update+render) to run.
+	:param seed int: level seed.
+	:return dict: {target name: per-frame durations in seconds}
+	"""
+	game = _game(count,seed)
+	samples = {"frame":[]}
+	with _timed({}) as totals:
+		for name in totals: samples[name] = []
+		for _ in range(frames):
+			steer(game)
+			for name in totals: totals[name] = 0.
+			start = perf_counter()
+			game._update_loop()
+			game._render_loop()
+			samples["frame"].append(perf_counter()-start)
+			for name,total in totals.items():
+				samples[name].append(total)
+	return samples
+
+
+def profile_allocations(count:int, frames:int=600, seed:int=0) -> dict:
+	""" Traces Python allocations of each frame of the same scripted game.
+	:return dict: {"alloc_peak_kib": mean per-frame high-water mark,
+		"alloc_blocks": mean per-frame memory blocks still allocated}
+	"""
+	game = _game(count,seed)
+	peaks,blocks = [],[]
+	tracemalloc.start()
+	for _ in range(frames):
+		steer(game)
+		before = tracemalloc.get_traced_memory()[0]
+		blocks_before = sys.getallocatedblocks()
+		tracemalloc.reset_peak()
+		game._update_loop()
+		game._render_loop()
+		peaks.append(tracemalloc.get_traced_memory()[1]-before)
+		blocks.append(sys.getallocatedblocks()-blocks_before)
+	tracemalloc.stop()
+	return {"alloc_peak_kib":sum(peaks)/frames/1024,
+		"alloc_blocks":sum(blocks)/frames}
+
+
+def summarize(samples:list) -> dict:
+	" Mean, median and 99th percentile (µs) of durations in seconds."
+	ordered = sorted(samples)
+	percentile = lambda q: ordered[min(len(ordered)-1,int(q*len(ordered)))]
+	return {"mean":sum(ordered)/len(ordered)*1e6,
+		"p50":percentile(.5)*1e6,
+		"p99":percentile(.99)*1e6}
+
+
+def run_suite(counts=(10,100,1000), frames:int=600, seed:int=0) -> dict:
+	""" Profiles hot paths for each platform count.
+	:return dict: JSON-serializable results (see compare).
+	"""
+	results = {}
+	for count in counts:
+		stats = {name:summarize(samples) for name,samples in
+			profile_hot_paths(count,frames,seed).items()}
+		stats["frame"].update(profile_allocations(count,frames,seed))
+		results[f"platforms={count}"] = stats
+	return {
+		"meta":{"python":platform.python_version(),
+			"pygame":pygame.version.ver,
+			"video_driver":pygame.display.get_driver(),
+			"frames":frames,"seed":seed},
+		"results":results}
+
+
+def compare(base:dict, new:dict, threshold:float=.1,
+		metric:str="p50") -> list:
+	""" Lists regressions between two run_suite results.
+	:param threshold float: allowed relative slow down (.1 <=> +10%).
+	:param metric str: statistic to compare (mean, p50 or p99).
+	:return list: (case, target, base value, new value) of regressions.
+	"""
+	regressions = []
+	for case,targets in new["results"].items():
+		for target,stats in targets.items():
+			old = base["results"].get(case,{}).get(target)
+			if old and stats[metric] > old[metric]*(1+threshold):
+				regressions.append((case,target,old[metric],stats[metric]))
+	return regressions
+
+
+def print_suite(results:dict) -> None:
+	for case,targets in results["results"].items():
+		print(case)
+		for target,stats in targets.items():
+			print(f"  {target:>18}: mean {stats['mean']:9.2f}  "
+				f"p50 {stats['p50']:9.2f}  p99 {stats['p99']:9.2f} µs")
+		frame = targets["frame"]
+		print(f"  {'allocations':>18}: {frame['alloc_peak_kib']:.2f} KiB peak, "
+			f"{frame['alloc_blocks']:+.2f} blocks /frame")
+
+
+def report() -> None:
+	" Prints the feature specific benchmarks."
+	print("Player.collisions (µs/call)")
+	for count,(indexed,linear) in bench_collisions().items():
+		print(f"{count:>6} platforms: indexed {indexed:8.2f}  linear {linear:8.2f}")
+	print("Game._render_loop (ms/frame, steered play, per SDL video driver)")
+	for (driver,mode),(ms,full,area) in bench_render().items():
+		print(f"{driver:>9} {mode:>5}: {ms:8.3f}  full redraws {full:6.1%}"
+			f"  screen updated {area:6.1%}")
+	us,surfaces,kib = bench_spawn()
+	print(f"Platform spawn: {us:.2f} µs/platform, {surfaces} surfaces ({kib:.1f} KiB)")
+	print(f"Level.update stress (dense platforms, fast scroll, {config.FPS} FPS)")
+	for mode,(mean,p99,worst,missing,filled) in bench_streaming().items():
+		fill = "never" if filled is None else f"{filled:.1f} ms"
+		print(f"{mode:>10}: mean {mean:7.3f} p99 {p99:7.3f} max {worst:7.3f} ms"
+			f"  missing platforms {missing:8.1f}  filled after {fill}")
+	print("Coarse timesteps (swept collisions, greedy agent, 3000 frames)")
+	for dt,(score,deaths,death,fps,ks_score,ks_death) in bench_timestep().items():
+		print(f"{dt} frame(s)/step: mean score {score:5.2f}  {deaths:3} deaths  "
+			f"death frame {death:7.1f}  {fps:9.0f} simulated frames/s  "
+			f"KS score {ks_score:.3f} death {ks_death:.3f}")
+	kib,us = bench_worlds()
+	print(f"1000 live worlds: {kib:.1f} KiB/world, {us:.2f} µs/world step")
+	print("World snapshots (restored into another world)")
+	for count,(saves,loads,size) in bench_snapshot().items():
+		print(f"{count:>6} platforms: {saves:9.0f} snapshots/s  "
+			f"{loads:9.0f} restores/s  {size:6} bytes")
+	print(f"Frame capture (µs/frame on the game loop at {config.FPS} FPS)")
+	for name,(p50,worst,dropped) in bench_capture().items():
+		print(f"{name:>10}: p50 {p50:8.1f}  max {worst:8.1f}  dropped {dropped}")
+	print(f"Frame pacing (render slowed down, target {config.FPS} steps/s)")
+	for (mode,load,skip),(rate,stats) in bench_pacing().items():
+		print(f"{mode:>6} +{load:3.0f} ms skip {skip}: {rate:5.1f} steps/s  "
+			f"{stats['render_fps']:5.1f} renders/s  {stats['skipped']:4} skipped  "
+			f"error p50 {stats['error_p50']:5.2f} p99 {stats['error_p99']:5.2f} ms")
+	print("Level layouts (platforms/s)")
+	for name,rate in bench_levelgen().items():
+		print(f"{name:>22}: {rate:12.0f}")
+	print("Event loop (µs/frame, 20 mouse motions + 1 key press)")
+	for name,us in bench_events().items():
+		print(f"{name:>10}: {us:8.2f}")
+	print("Headless episodes, sparse inputs (World.update calls, ms/episode)")
+	for mode,(calls,ms) in bench_advance().items():
+		print(f"{mode:>12}: {calls:8.0f} {ms:8.2f}")
+	print("Memory (bytes/object)")
+	for name,size in bench_memory().items():
+		print(f"{name:>16}: {size:8.1f}")
+	print("Observations (µs/step)")
+	for name,us in bench_observation().items():
+		print(f"{name:>16}: {us:8.1f}")
+	print("Start-up (ms, fresh interpreter)")
+	for name,ms in bench_startup().items():
+		print(f"{name:>16}: {ms:8.1f}")
+	print("Score HUD (per frame)")
+	for name,(us,allocated,peak) in bench_hud().items():
+		print(f"{name:>12}: {us:8.2f} µs  {allocated:6} surfaces  {peak:8.1f} KiB peak")
+
+
+
+
+if __name__ == "__main__":
+	parser = ArgumentParser(description="DoodleJump benchmarks "
+		"(headless: SDL_VIDEODRIVER defaults to dummy)")
+	commands = parser.add_subparsers(dest="command")
+	suite = commands.add_parser("suite",help="profile hot paths (default)")
+	suite.add_argument("-o","--output",help="save results as JSON")
+	suite.add_argument("--counts",type=int,nargs="+",default=[10,100,1000],
+		help="platform counts to sweep")
+	suite.add_argument("--frames",type=int,default=600)
+	suite.add_argument("--seed",type=int,default=0)
+	check = commands.add_parser("compare",help="check for regressions")
+	check.add_argument("base",help="JSON results of the reference revision")
+	check.add_argument("new",help="JSON results of the tested revision")
+	check.add_argument("--threshold",type=float,default=.1,
+		help="allowed relative slow down (default: .1)")
+	check.add_argument("--metric",choices=("mean","p50","p99"),default="p50")
+	commands.add_parser("report",help="feature specific benchmarks")
+	args = parser.parse_args()
+
+	if args.command == "compare":
+		with open(args.base) as base, open(args.new) as new:
+			regressions = compare(json.load(base),json.load(new),
+				args.threshold,args.metric)
+		for case,target,old,value in regressions:
+			print(f"REGRESSION {case} {target}: {old:.2f} -> {value:.2f} µs "
+				f"({value/old-1:+.0%})")
+		print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+		sys.exit(1 if regressions else 0)
+	elif args.command == "report":
+		report()
+	else:
+		results = run_suite(**{k:getattr(args,k,d) for k,d in
+			(("counts",(10,100,1000)),("frames",600),("seed",0))})
+		print_suite(results)
+		if getattr(args,"output",None):
+			with open(args.output,"w") as file:
+				json.dump(results,file,indent=1)
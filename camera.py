@@ -20,37 +20,66 @@
 
 from pygame import Rect
 from pygame.sprite import Sprite
+import struct
 
-from singleton import Singleton
 import settings as config
 
 
 
-class Camera(Singleton):
+class Camera:
 	"""
 		A class to represent the camera.
 
 		Manages level position scrolling.
-		Can be access via Singleton: Camera.instance.
-		(Check Singleton design pattern for more info)
+		Owned by a World (see world.py), given to the level and player.
 	"""
+	# snapshot: state.y, maxheight, last_y, render_y
+	STATE = struct.Struct("<iiii")
+
 	# constructor called on new instance: Camera()
-	def __init__(self, lerp=5,width=config.XWIN, height=config.YWIN):
+	def __init__(self, lerp=config.CAMERA_LERP,width=config.XWIN, height=config.YWIN):
 		self.state = Rect(0, 0, width, height)
 		self.lerp = lerp
 		self.center = height//2
 		self.maxheight = self.center
+		# rendered position: between last and current state (interpolate)
+		self.render_y = self.last_y = self.state.y
 
 	def reset(self) -> None:
 		" Called only when game restarts (after player death)."
 		self.state.y = 0
 		self.maxheight = self.center
+		self.render_y = self.last_y = self.state.y
+
+	def snapshot(self, out:bytearray) -> None:
+		" Appends the camera state to a World snapshot."
+		out += self.STATE.pack(self.state.y,self.maxheight,
+			self.last_y,self.render_y)
+
+	def restore(self, data:bytes, pos:int) -> int:
+		""" Sets the state written by snapshot() at data[pos:].
+		:return int: position after it.
+		"""
+		(self.state.y,self.maxheight,self.last_y,
+			self.render_y) = self.STATE.unpack_from(data,pos)
+		return pos+self.STATE.size
+
+	def freeze(self) -> None:
+		" Called instead of update on steps where camera must not move."
+		self.render_y = self.last_y = self.state.y
+
+	def interpolate(self, alpha:float) -> None:
+		""" Sets render position between last update and current state.
+		Should be called before drawing.
+		:param alpha float: 0 (last update) to 1 (current state).
+		"""
+		self.render_y = round(self.last_y + (self.state.y-self.last_y)*alpha)
 	
 	def apply_rect(self,rect:Rect) -> Rect:
-		""" Transforms given rect relative to camera position.
+		""" Transforms given rect relative to camera render position.
 		:param rect pygame.Rect: the rect to transform
 		"""
-		return rect.move((0,-self.state.topleft[1]))
+		return rect.move((0,-self.render_y))
 	
 	def apply(self, target:Sprite) -> Rect:
 		""" Returns new target render position based on current camera position.
@@ -58,16 +87,24 @@ class Camera(Singleton):
 		"""
 		return self.apply_rect(target.rect)
 	
-	def update(self, target:Rect) -> None:
+	def update(self, target:Rect, dt:float=1., top:int=None) -> None:
 		""" Scrolls up to maxheight reached by player.
 		Should be called each frame.
 		:param target pygame.Rect: the target position to follow.
+		:param dt float: simulated time in frames (config.TIMESTEP).
+		:param top int: highest y reached by target since last update
+			(default: target.y).
 		"""
+		if top is None: top = target.y
 		# updating maxheight
-		if(target.y<self.maxheight):
+		if(top<self.maxheight):
 			self.lastheight = self.maxheight
-			self.maxheight = target.y
+			self.maxheight = top
 		# calculate scrolling speed required
 		speed = ((self.state.y+self.center)-self.maxheight)/self.lerp
+		if dt != 1:# as many lerp steps as frames
+			speed *= self.lerp*(1-(1-1/self.lerp)**dt)
+		self.last_y = self.state.y
 		self.state.y-=speed
+		self.render_y = self.state.y
 
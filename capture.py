@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+	CopyLeft 2021 Michael Rouves
+
+	This file is part of Pygame-DoodleJump.
+	Pygame-DoodleJump is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+
+	Pygame-DoodleJump is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+	GNU Affero General Public License for more details.
+
+	You should have received a copy of the GNU Affero General Public License
+	along with Pygame-DoodleJump. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+from queue import Queue, Empty
+from threading import Thread
+from time import perf_counter
+import os, struct, zlib
+
+import numpy as np
+import pygame
+from pygame import Surface
+
+import settings as config
+
+
+# Frame stream format ("raw" and "zlib", little endian):
+#	header: magic "DJFS", version (u8), width, height (u16), compressed (u8)
+#	frames: frame number (u32), data size (u32), RGBX rows (zlib if compressed)
+# "png" writes one file per frame in a directory: frame_000042.png
+MAGIC = b"DJFS"
+VERSION = 1
+HEADER = struct.Struct("<4sBHHB")
+FRAME = struct.Struct("<II")
+FORMATS = ("png","raw","zlib")
+POLICIES = ("drop","block")
+
+
+
+class FrameCapture:
+	"""
+	A class to represent an asynchronous frame recorder.
+
+	capture() only blits the frame into a free buffer of a preallocated pool
+	(surfaces wrapping NumPy arrays, like observation.Observer) and queues
+	it: a writer thread encodes and writes it, then gives the buffer back.
+	When every buffer is in use the frame is dropped (counted) or, with the
+	"block" policy, capture() waits for the writer (back-pressure).
+	"""
+
+	def __init__(self, path:str, size:tuple=config.DISPLAY,
+			format:str=config.CAPTURE_FORMAT, pool:int=config.CAPTURE_POOL,
+			policy:str=config.CAPTURE_POLICY):
+		"""
+		:param path str: stream file ("raw", "zlib") or directory ("png").
+		:param size tuple: (width, height) of captured frames.
+		:param format str: one of FORMATS.
+		:param pool int: preallocated frame buffers.
+		:param policy str: "drop" frames or "block" when no buffer is free.
+		"""
+		assert format in FORMATS, "Unknown capture format !"
+		assert policy in POLICIES, "Unknown capture policy !"
+		self.path = path
+		self.size = tuple(size)
+		self.format = format
+		self.policy = policy
+		self.captured = 0# frames queued
+		self.dropped = 0# frames lost (no free buffer)
+		self.written = 0# frames saved by the writer
+		self.overhead = 0.# time spent in capture() (s)
+		self.__free = Queue()
+		w,h = self.size
+		for _ in range(max(pool,1)):
+			array = np.zeros((h,w,4),np.uint8)
+			self.__free.put((array,pygame.image.frombuffer(array,self.size,"RGBX")))
+		self.__queue = Queue()# (frame, buffer), None: stop
+		if format == "png":
+			os.makedirs(path,exist_ok=True)
+			self.__file = None
+		else:
+			self.__file = open(path,"wb")
+			self.__file.write(HEADER.pack(MAGIC,VERSION,w,h,format=="zlib"))
+		self.__thread = Thread(target=self._work,name="FrameCapture",daemon=True)
+		self.__thread.start()
+
+	def capture(self, surface:Surface, frame:int=None) -> bool:
+		""" Queues a copy of the frame for writing.
+		:param surface pygame.Surface: the frame (ex: the window).
+		:param frame int: frame number stored with it
+			(default: frames captured or dropped so far).
+		:return bool: False if the frame was dropped.
+		"""
+		start = perf_counter()
+		if frame is None: frame = self.captured+self.dropped
+		try:
+			buffer = self.__free.get(self.policy == "block")
+		except Empty:
+			self.dropped += 1
+			self.overhead += perf_counter()-start
+			return False
+		buffer[1].blit(surface,(0,0))
+		self.__queue.put((frame,buffer))
+		self.captured += 1
+		self.overhead += perf_counter()-start
+		return True
+
+	def _work(self) -> None:
+		while True:
+			item = self.__queue.get()
+			if item is None: break
+			frame,buffer = item
+			array,surface = buffer
+			if self.__file:
+				data = array.data# (written as is, no copy)
+				if self.format == "zlib":
+					data = zlib.compress(data,1)
+				self.__file.write(FRAME.pack(frame,len(data)))
+				self.__file.write(data)
+			else:
+				pygame.image.save(surface,
+					os.path.join(self.path,f"frame_{frame:06d}.png"))
+			self.written += 1
+			self.__free.put(buffer)
+
+	def close(self) -> None:
+		" Writes the queued frames then stops the writer."
+		if self.__thread:
+			self.__queue.put(None)
+			self.__thread.join()
+			self.__thread = None
+			if self.__file:
+				self.__file.close()
+
+	def stats(self) -> str:
+		" Capture summary (frames written/dropped, overhead per frame)."
+		frames = self.captured+self.dropped
+		return (f"{self.written} frames written, {self.dropped} dropped "
+			f"({self.dropped/max(frames,1):.1%}), capture "
+			f"{self.overhead/max(frames,1)*1e6:.0f} µs/frame")
+
+
+
+def read_frames(path:str):
+	""" Iterates over a "raw" or "zlib" frame stream.
+	:param path str: file written by FrameCapture.
+	:return iter: (frame number, (height, width, 3) uint8 array).
+	"""
+	with open(path,"rb") as file:
+		magic,version,w,h,compressed = HEADER.unpack(file.read(HEADER.size))
+		assert magic == MAGIC, "Not a DoodleJump frame stream !"
+		assert version == VERSION, "Unsupported frame stream version !"
+		while True:
+			header = file.read(FRAME.size)
+			if len(header) < FRAME.size: return
+			frame,size = FRAME.unpack(header)
+			data = file.read(size)
+			if compressed: data = zlib.decompress(data)
+			yield frame,np.frombuffer(data,np.uint8).reshape(h,w,4)[:,:,:3]
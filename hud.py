@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+	CopyLeft 2021 Michael Rouves
+
+	This file is part of Pygame-DoodleJump.
+	Pygame-DoodleJump is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+
+	Pygame-DoodleJump is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+	GNU Affero General Public License for more details.
+
+	You should have received a copy of the GNU Affero General Public License
+	along with Pygame-DoodleJump. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+from collections import OrderedDict
+from pygame import Surface, SRCALPHA, BLEND_RGBA_MAX
+from pygame.font import Font
+
+
+
+class GlyphAtlas:
+	"""
+	A class to represent pre-rendered glyphs of a font.
+
+	Each character of the charset is rasterized once, texts made of
+	those characters are then composed with blits (no kerning).
+	"""
+
+	def __init__(self, font:Font, color:tuple, charset:str="-0123456789 m"):
+		self.color = color
+		self.glyphs = {c:font.render(c,1,color) for c in charset}
+		self.height = max(g.get_height() for g in self.glyphs.values())
+
+	def size(self, text:str) -> tuple:
+		" Size of the surface needed to compose given text."
+		return sum(self.glyphs[c].get_width() for c in text),self.height
+
+	def compose(self, text:str, surface:Surface=None) -> Surface:
+		""" Blits text glyphs side by side.
+		:param text str: the text (characters must be in the charset).
+		:param surface pygame.Surface: optional SRCALPHA target to reuse,
+			must be at least self.size(text).
+		:return pygame.Surface: the composed text.
+		"""
+		if surface is None:
+			surface = Surface(self.size(text),SRCALPHA)
+		surface.fill((0,0,0,0))
+		x = 0
+		for c in text:
+			glyph = self.glyphs[c]
+			# glyphs never overlap: RGBA_MAX on a cleared surface copies them
+			surface.blit(glyph,(x,0),special_flags=BLEND_RGBA_MAX)
+			x += glyph.get_width()
+		return surface
+
+
+
+class NumberText:
+	"""
+	A class to represent a number displayed with a glyph atlas (ex: score).
+
+	Recomposes its surface only when the value changes.
+	"""
+
+	def __init__(self, atlas:GlyphAtlas, suffix:str="", value:int=0):
+		self.atlas = atlas
+		self.suffix = suffix
+		self.value = None
+		self.surface = None
+		self.render(value)
+
+	def render(self, value:int) -> Surface:
+		""" Returns the surface displaying given value.
+		:param value int: the number to display.
+		"""
+		if value != self.value:
+			self.value = value
+			text = str(value)+self.suffix
+			size = self.atlas.size(text)
+			if self.surface and self.surface.get_size() == size:
+				self.atlas.compose(text,self.surface)
+			else:
+				self.surface = self.atlas.compose(text)
+		return self.surface
+
+
+
+class TextCache:
+	"""
+	A class to represent a LRU cache of rendered texts.
+
+	Used for dynamic strings that are not worth an atlas.
+	"""
+
+	def __init__(self, maxsize:int=64):
+		self.maxsize = maxsize
+		self.__cache = OrderedDict()
+
+	def __len__(self) -> int:
+		return len(self.__cache)
+
+	def render(self, font:Font, text:str, color:tuple) -> Surface:
+		""" Like Font.render(text,1,color) but cached.
+		Returned surface is shared: should not be modified.
+		"""
+		key = (id(font),text,color)
+		surface = self.__cache.get(key)
+		if surface is None:
+			surface = self.__cache[key] = font.render(text,1,color)
+			if len(self.__cache) > self.maxsize:
+				self.__cache.popitem(last=False)
+		else:
+			self.__cache.move_to_end(key)
+		return surface
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+	CopyLeft 2021 Michael Rouves
+
+	This file is part of Pygame-DoodleJump.
+	Pygame-DoodleJump is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+
+	Pygame-DoodleJump is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+	GNU Affero General Public License for more details.
+
+	You should have received a copy of the GNU Affero General Public License
+	along with Pygame-DoodleJump. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+from collections import deque
+from time import perf_counter
+
+from pygame.locals import QUIT,KEYDOWN,KEYUP,K_LEFT,K_RIGHT
+from pygame.event import Event
+import pygame
+
+
+# Input sources API: source.poll(game) -> list of pygame events, called by
+# Game._event_loop once per loop iteration (before the updates).
+# Event types the game uses: every other type is dropped by SDL (filter_events)
+EVENT_TYPES = (QUIT,KEYDOWN,KEYUP)
+DIRECTION_KEYS = {-1:K_LEFT,1:K_RIGHT}
+
+
+def filter_events(types:tuple=EVENT_TYPES) -> None:
+	""" Only lets given event types into pygame's event queue.
+	(mouse motion, window and text events are never queued nor converted)
+	"""
+	pygame.event.set_blocked(None)
+	pygame.event.set_allowed(types)
+
+
+def direction_events(current:int, direction:int) -> list:
+	""" Key events turning held direction into another one, like a keyboard.
+	:param current int: held direction (Player._input): -1, 0 or 1.
+	:param direction int: wanted direction: -1 (left), 0 (none) or 1 (right).
+	"""
+	events = []
+	if direction == current: return events
+	if current:
+		events.append(Event(KEYUP,key=DIRECTION_KEYS[current]))
+	if direction:
+		events.append(Event(KEYDOWN,key=DIRECTION_KEYS[direction]))
+	return events
+
+
+
+class KeyboardSource:
+	" Events of the window (keyboard, quit), filtered by filter_events."
+
+	def __init__(self, types:tuple=EVENT_TYPES):
+		filter_events(types)
+
+	def poll(self, game) -> list:
+		return pygame.event.get()
+
+
+
+class ScriptedSource:
+	"""
+	A class to represent a timeline of inputs.
+
+	Events are given with the number of updates that must be done before
+	they are applied, like replay.Recording.events (Recording.events can be
+	played this way in real time). With several updates per loop iteration,
+	an event is applied at the first iteration that reaches its step.
+	"""
+
+	def __init__(self, timeline:list):
+		" :param timeline list: (step, pygame.Event) sorted by step."
+		self.timeline = deque(timeline)
+
+	def poll(self, game) -> list:
+		events = []
+		while self.timeline and self.timeline[0][0] <= game.steps:
+			events.append(self.timeline.popleft()[1])
+		return events
+
+
+
+class AgentSource:
+	" Inputs of a programmatic agent: agent(game) -> direction (see tournament.py)."
+
+	def __init__(self, agent):
+		self.agent = agent
+
+	def poll(self, game) -> list:
+		if game.player.dead: return []
+		return direction_events(game.player._input,self.agent(game))
+
+
+
+class LatencyTracker:
+	"""
+	A class to represent input latency measurements.
+
+	Each direction key event is timestamped when polled, with the player's
+	horizontal velocity at that time. The first update after which that
+	velocity differs gives the input-to-update latency, the next displayed
+	frame the input-to-display latency. Inputs without visible effect are
+	dropped after max_steps updates (ex: releasing a key when stopped).
+	Timestamps are taken by the game (pygame events carry none), so time
+	spent in SDL's queue is not included.
+	"""
+
+	def __init__(self, max_steps:int=60, size:int=10000):
+		self.max_steps = max_steps
+		self.update_latencies = deque(maxlen=size)# (s)
+		self.display_latencies = deque(maxlen=size)# (s)
+		self.inputs = 0
+		self.dropped = 0
+		self.__pending = []# [time, velocity x, updates]
+		self.__updated = []# times of inputs updated but not displayed
+
+	def input(self, event:Event, player) -> None:
+		" Called when an event is polled (before it is handled)."
+		if event.type not in (KEYDOWN,KEYUP): return
+		if event.key not in DIRECTION_KEYS.values(): return
+		self.inputs += 1
+		self.__pending.append([perf_counter(),player._velocity.x,0])
+
+	def updated(self, player) -> None:
+		" Called after each update."
+		if not self.__pending: return
+		now,pending = perf_counter(),[]
+		for item in self.__pending:
+			start,velocity,steps = item
+			if player._velocity.x != velocity:
+				self.update_latencies.append(now-start)
+				self.__updated.append(start)
+			elif steps+1 >= self.max_steps:
+				self.dropped += 1
+			else:
+				item[2] += 1
+				pending.append(item)
+		self.__pending = pending
+
+	def displayed(self) -> None:
+		" Called once a frame is shown."
+		if not self.__updated: return
+		now = perf_counter()
+		for start in self.__updated:
+			self.display_latencies.append(now-start)
+		self.__updated.clear()
+
+	@staticmethod
+	def percentiles(values) -> tuple:
+		" (p50, p99, max) of values (ms)."
+		if not values: return (0.,0.,0.)
+		values = sorted(values)
+		return tuple(v*1e3 for v in (values[len(values)//2],
+			values[int(len(values)*.99)],values[-1]))
+
+	def report(self) -> str:
+		lines = [f"{self.inputs} inputs, {self.dropped} without effect"]
+		for name,values in (("input to update",self.update_latencies),
+				("input to display",self.display_latencies)):
+			if not values:# (ex: nothing displayed)
+				lines.append(f"{name:>16}: n/a")
+				continue
+			lines.append("{:>16}: p50 {:7.2f} ms  p99 {:7.2f} ms  max {:7.2f} ms"
+				.format(name,*self.percentiles(values)))
+		return "\n".join(lines)
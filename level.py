@@ -18,18 +18,20 @@
 """
 
 
-from random import randint
+from random import Random, randint, randrange
+from array import array
 from pygame import Surface
-import asyncio
+import struct
 
-from singleton import Singleton
 from sprite import Sprite
+from profiler import PROFILER
+from streaming import LevelStreamer
 import settings as config
 
 
 
 #return True with a chance of: P(X=True)=1/x
-chance = lambda x: not randint(0,x)
+chance = lambda x,randint=randint: not randint(0,x)
 
 
 class Bonus(Sprite):
@@ -38,6 +40,8 @@ class Bonus(Sprite):
 	Inherits the Sprite class.
 	"""
 
+	__slots__ = ("parent","force")
+
 	WIDTH = 15
 	HEIGHT = 15
 
@@ -48,6 +52,17 @@ class Bonus(Sprite):
 		super().__init__(*self._get_inital_pos(),
 			Bonus.WIDTH, Bonus.HEIGHT, color)
 		self.force = force
+
+	@property
+	def camera(self):
+		return self.parent.camera
+
+	def respawn(self, parent:Sprite) -> None:
+		""" Recycles the bonus onto another platform.
+		:param parent Sprite: the new platform holding the bonus.
+		"""
+		self.parent = parent
+		self.rect.topleft = self._get_inital_pos()
 	
 	def _get_inital_pos(self):
 		x = self.parent.rect.centerx - Bonus.WIDTH//2
@@ -66,16 +81,34 @@ class Platform(Sprite):
 	Can have a bonus spring or broke on player jump.
 	Inherits the Sprite class.
 	"""
+	__slots__ = ("breakable","__bonus","__level","_slot")
+
 	# (Overriding inherited constructor: Sprite.__init__)
 	def __init__(self, x:int, y:int, width:int, height:int,
-			initial_bonus=False,breakable=False):
+			initial_bonus=False,breakable=False,level=None):
 
 		color = config.PLATFORM_COLOR
 		if breakable:color = config.PLATFORM_COLOR_LIGHT
 		super().__init__(x,y,width,height,color)
 
 		self.breakable = breakable
-		self.__level = Level.instance
+		self.__bonus = None
+		self.__level = level# (None: standalone platform)
+		self._slot = None# index in Level's PlatformRing
+		if initial_bonus:
+			self.add_bonus(Bonus)
+
+	def respawn(self, x:int, y:int, initial_bonus=False,
+			breakable=False) -> None:
+		""" Recycles a retired platform instead of allocating a new one.
+		Takes the same arguments as the constructor (size is kept).
+		"""
+		self.rect.topleft = (x,y)
+		color = config.PLATFORM_COLOR
+		if breakable:color = config.PLATFORM_COLOR_LIGHT
+		if color != self.color:
+			self.color = color
+		self.breakable = breakable
 		self.__bonus = None
 		if initial_bonus:
 			self.add_bonus(Bonus)
@@ -84,13 +117,20 @@ class Platform(Sprite):
 	@property
 	def bonus(self):return self.__bonus
 
+	@property
+	def camera(self):
+		return self.__level.camera if self.__level else None
+
 	def add_bonus(self,bonus_type:type) -> None:
 		""" Safely adds a bonus to the platform.
 		:param bonus_type type: the type of bonus to add.
 		"""
 		assert issubclass(bonus_type,Bonus), "Not a valid bonus type !"
 		if not self.__bonus and not self.breakable:
-			self.__bonus = bonus_type(self)
+			if self.__level:
+				self.__bonus = self.__level.reuse_bonus(bonus_type,self)
+			else:
+				self.__bonus = bonus_type(self)
 	
 	def remove_bonus(self) -> None:
 		" Safely removes platform's bonus."
@@ -98,7 +138,7 @@ class Platform(Sprite):
 
 	def onCollide(self) -> None:
 		" Called in update if collision with player (safe to overrided)."
-		if self.breakable:
+		if self.breakable and self.__level:
 			self.__level.remove_platform(self)
 		
 	# ( Overriding inheritance: Sprite.draw() )
@@ -107,28 +147,194 @@ class Platform(Sprite):
 		Also draws the platform's bonus if it has one.
 		:param surface pygame.Surface: the surface to draw on.
 		"""
-		# check if out of screen: should be deleted
 		super().draw(surface)
 		if self.__bonus:
 			self.__bonus.draw(surface)
-		if self.camera_rect.y+self.rect.height>config.YWIN:
-			self.__level.remove_platform(self)
 
 
 
 
 
-class Level(Singleton):
+class PlatformRing:
+	"""
+	A class to represent the platforms of a level, in spawn order.
+
+	Fixed-capacity ring buffer: append and removal are O(1).
+	A removed platform leaves an empty slot that is skipped while iterating
+	and reclaimed once it reaches the head or the tail of the ring.
+	Capacity doubles only if holes fill the whole ring.
+
+	Also a vertical index: platforms are generated upwards so slots are
+	sorted by decreasing y, which between() bisects (platforms must not move
+	once added). Falls back to a linear scan if that order is ever broken.
+	"""
+
+	def __init__(self, capacity:int):
+		self._slots = [None]*max(capacity,1)
+		self._keys = [0]*len(self._slots)# rect.y of each slot (kept in holes)
+		self._sorted = True
+		self._head = 0# oldest slot
+		self._size = 0# used slots from head (holes included)
+		self._count = 0# live platforms
+		self.version = 0# incremented on each change
+
+	def __len__(self) -> int:
+		return self._count
+
+	def __bool__(self) -> bool:
+		return self._count > 0
+
+	def __contains__(self, plt:Sprite) -> bool:
+		slot = getattr(plt,"_slot",None)
+		return slot is not None and self._slots[slot] is plt
+
+	def __iter__(self):
+		slots,capacity = self._slots,len(self._slots)
+		for i in range(self._head, self._head+self._size):
+			plt = slots[i%capacity]
+			if plt is not None:
+				yield plt
+
+	@property
+	def last(self) -> Sprite:
+		" Most recently added platform (None if empty)."
+		if not self._size: return None
+		return self._slots[(self._head+self._size-1)%len(self._slots)]
+
+	def _grow(self) -> None:
+		old = list(self)
+		self._slots = [None]*(len(self._slots)*2)
+		self._keys = [0]*len(self._slots)
+		self._head = self._size = self._count = 0
+		for plt in old:
+			self.append(plt)
+
+	def append(self, plt:Sprite) -> None:
+		" Adds a platform after the last one."
+		if self._size == len(self._slots):
+			self._grow()
+		slot = (self._head+self._size)%len(self._slots)
+		if self._size and plt.rect.y > self.last.rect.y:
+			self._sorted = False
+		self._slots[slot] = plt
+		self._keys[slot] = plt.rect.y
+		plt._slot = slot
+		self._size += 1
+		self._count += 1
+		self.version += 1
+
+	def remove(self, plt:Sprite) -> bool:
+		""" Removes a platform.
+		:return bool: False if the platform was not in the ring.
+		"""
+		if plt not in self:
+			return False
+		slots,capacity = self._slots,len(self._slots)
+		slots[plt._slot] = None
+		plt._slot = None
+		self._count -= 1
+		self.version += 1
+		# reclaim empty slots at both ends
+		while self._size and slots[self._head] is None:
+			self._head = (self._head+1)%capacity
+			self._size -= 1
+		while self._size and slots[(self._head+self._size-1)%capacity] is None:
+			self._size -= 1
+		return True
+
+	def clear(self) -> list:
+		""" Removes every platform.
+		:return list: the removed platforms.
+		"""
+		removed = list(self)
+		for plt in removed:
+			plt._slot = None
+		self._slots = [None]*len(self._slots)
+		self._head = self._size = self._count = 0
+		self._sorted = True
+		self.version += 1
+		return removed
+
+	def _bisect(self, y:int) -> int:
+		" Index (from head) of the first slot with a key lower than y."
+		keys,capacity,head = self._keys,len(self._keys),self._head
+		lo,hi = 0,self._size
+		while lo < hi:
+			mid = (lo+hi)//2
+			if keys[(head+mid)%capacity] < y: hi = mid
+			else: lo = mid+1
+		return lo
+
+	def between(self, top:int, bottom:int):
+		""" Iterates (in spawn order) over platforms with top<=rect.y<=bottom.
+		:param top int: smallest y wanted.
+		:param bottom int: greatest y wanted.
+		"""
+		if not self._sorted:
+			yield from (p for p in self if top <= p.rect.y <= bottom)
+			return
+		slots,capacity = self._slots,len(self._slots)
+		for i in range(self._bisect(bottom+1), self._bisect(top)):
+			plt = slots[(self._head+i)%capacity]
+			if plt is not None:
+				yield plt
+
+	def nearest(self, y:int):
+		""" Iterates over platforms by increasing vertical distance to y.
+		:param y int: the reference height (ex: player's rect.y).
+		"""
+		if not self._sorted:
+			yield from sorted(self,key=lambda p:abs(p.rect.y-y))
+			return
+		slots,keys,capacity = self._slots,self._keys,len(self._slots)
+		# merge both sides of y: above (i up) and below (j down)
+		i = self._bisect(y+1)
+		j = i-1
+		while i < self._size or j >= 0:
+			above = i < self._size
+			if above and j >= 0:
+				above = y-keys[(self._head+i)%capacity] <= keys[(self._head+j)%capacity]-y
+			if above:
+				plt = slots[(self._head+i)%capacity]
+				i += 1
+			else:
+				plt = slots[(self._head+j)%capacity]
+				j -= 1
+			if plt is not None:
+				yield plt
+
+
+
+
+
+class Level:
 	"""
 	A class to represent the level.
 	
 	used to manage updates/generation of platforms.
-	Can be access via Singleton: Level.instance.
-	(Check Singleton design pattern for more info)
+	Owned by a World (see world.py), scrolled by the world's camera.
 	"""
+	# snapshot: seed, random generator state (gauss_next flag and value,
+	# then 625 u32), platform and pending removal counts,
+	# then platforms in spawn order: x, y, flags
+	# then pending removals: platform index
+	STATE = struct.Struct("<QBdHH")
+	RNG_WORDS = 625
+	PLATFORM = struct.Struct("<iiB")
+	PENDING = struct.Struct("<H")
+	BREAKABLE,BONUS,BASE = 1,2,4# platform flags
 	
 	# constructor called on new instance: Level()
-	def __init__(self):
+	def __init__(self, seed:int=None, streaming:bool=None, camera=None,
+			layouts=None):
+		"""
+		:param layouts levelgen.LayoutBank: source of pre-validated
+			layouts (default: random, like the seed says).
+		"""
+		self.camera = camera# (None: no scrolling, nothing culled)
+		# own generator: same seed <=> same level
+		self.seed = randrange(1<<32) if seed is None else seed
+		self.rng = Random(self.seed)
 		self.platform_size = config.PLATFORM_SIZE
 		self.max_platforms = config.MAX_PLATFORM_NUMBER
 		self.distance_min = min(config.PLATFORM_DISTANCE_GAP)
@@ -137,45 +343,123 @@ class Level(Singleton):
 		self.bonus_platform_chance = config.BONUS_SPAWN_CHANCE
 		self.breakable_platform_chance = config.BREAKABLE_PLATFORM_CHANCE
 
-		self.__platforms = []
+		self.__platforms = PlatformRing(2*self.max_platforms)
 		self.__to_remove = []
+		# retired sprites, recycled by create_platform
+		self.__platform_pool = []
+		self.__bonus_pool = []
 
 		self.__base_platform = Platform(
 			config.HALF_XWIN - self.platform_size[0]//2,# X POS
 			config.HALF_YWIN + config.YWIN/3, #           Y POS
-			*self.platform_size)#                         SIZE
+			*self.platform_size,#                         SIZE
+			level=self)
+		self.__platforms.append(self.__base_platform)
+
+		# optional layout source: background generation (see streaming.py)
+		# or pre-validated layouts (see levelgen.py), same interface
+		if streaming is None: streaming = config.LEVEL_STREAMING
+		self.streamer = layouts
+		if self.streamer is None and streaming:
+			self.streamer = LevelStreamer(self,self.seed)
+		if self.streamer:
+			self.streamer.start(self.__base_platform.rect.y)
 	
 
 	# Public getter for __platforms so it remains private
 	@property
-	def platforms(self) -> list:
+	def platforms(self) -> PlatformRing:
 		return self.__platforms
 
 
-	async def _generation(self) -> None:
-		" Asynchronous management of platforms generation."
+	def platforms_near(self, rect) -> iter:
+		""" Platforms whose rect or bonus may collide with given rect.
+		:param rect pygame.Rect: the rect to test (ex: player's rect).
+		"""
+		return self.__platforms.between(
+			rect.top - self.platform_size[1],
+			rect.bottom + Bonus.HEIGHT)
+
+
+	def nearest_platforms(self, y:int) -> iter:
+		""" Platforms by increasing vertical distance to given height.
+		:param y int: the reference height (ex: player's rect.y).
+		"""
+		return self.__platforms.nearest(y)
+
+
+	def _generation(self) -> None:
+		" Management of platforms generation."
 		# Check how many platform we need to generate
 		nb_to_generate = self.max_platforms - len(self.__platforms)
+		if self.streamer:
+			# limited sprites per frame
+			nb_to_generate = min(nb_to_generate,config.STREAM_SPAWN_BUDGET)
+			if self.streamer.ready < nb_to_generate:
+				# worker late (ex: fast forward without frame pacing):
+				# generate the next layouts on this thread
+				self.streamer.generate(nb_to_generate)
 		for _ in range(nb_to_generate):
-			self.create_platform()
+			if not self.create_platform():
+				break
 		
 
-	def create_platform(self) -> None:
-		" Create the first platform or a new one."
-		if self.__platforms:
+	def create_platform(self) -> bool:
+		""" Create the first platform or a new one.
+		:return bool: False if streamed layouts are not ready yet.
+		"""
+		if self.__platforms and self.streamer:
+			# Next layout generated in background
+			record = self.streamer.pop()
+			if not record: return False
+			self.__platforms.append(self._new_platform(record.x,record.y,
+				initial_bonus=record.bonus,breakable=record.breakable))
+		elif self.__platforms:
 			# Generate a new random platform :
 			# x position along screen width
 			# y position starting from last platform y pos +random offset
+			randint = self.rng.randint
 			offset = randint(self.distance_min,self.distance_max)
-			self.__platforms.append(Platform(
+			self.__platforms.append(self._new_platform(
 				randint(0,config.XWIN-self.platform_size[0]),#       X POS
-				self.__platforms[-1].rect.y-offset,#                 Y POS
-				*self.platform_size, #                               SIZE
-				initial_bonus=chance(self.bonus_platform_chance),# HAS A Bonus
-				breakable=chance(self.breakable_platform_chance)))#  IS BREAKABLE
+				self.__platforms.last.rect.y-offset,#                Y POS
+				initial_bonus=chance(self.bonus_platform_chance,randint),#HAS A Bonus
+				breakable=chance(self.breakable_platform_chance,randint)))#BREAKABLE
 		else:
 			# (just in case) no platform: add the base one
 			self.__platforms.append(self.__base_platform)
+		return True
+
+
+	def _new_platform(self, x:int, y:int, **kwargs) -> Platform:
+		" Returns a recycled platform if any, else a new one."
+		if self.__platform_pool:
+			plt = self.__platform_pool.pop()
+			plt.respawn(x, y, **kwargs)
+			return plt
+		return Platform(x, y, *self.platform_size, level=self, **kwargs)
+
+
+	def _retire(self, plt:Platform) -> None:
+		" Stores a removed platform (and its bonus) for recycling."
+		if plt.bonus:
+			self.__bonus_pool.append(plt.bonus)
+			plt.remove_bonus()
+		if plt is not self.__base_platform:
+			self.__platform_pool.append(plt)
+
+
+	def reuse_bonus(self, bonus_type:type, parent:Platform) -> Bonus:
+		""" Returns a recycled bonus if any, else a new one.
+		:param bonus_type type: the type of bonus wanted.
+		:param parent Platform: the platform holding the bonus.
+		"""
+		pool = self.__bonus_pool
+		if pool and type(pool[-1]) is bonus_type:
+			bonus = pool.pop()
+			bonus.respawn(parent)
+			return bonus
+		return bonus_type(parent)
 
 
 	def remove_platform(self,plt:Platform) -> bool:
@@ -189,23 +473,129 @@ class Level(Singleton):
 		return False
 
 
+	def snapshot(self, out:bytearray) -> None:
+		" Appends the level state to a World snapshot."
+		assert not self.streamer, "Snapshots need synchronous generation !"
+		version,words,gauss = self.rng.getstate()
+		index = {}
+		for i,platform in enumerate(self.__platforms):
+			index[platform] = i
+		out += self.STATE.pack(self.seed,gauss is not None,gauss or 0.,
+			len(index),len(self.__to_remove))
+		out += array("I",words).tobytes()
+		pack,base = self.PLATFORM.pack,self.__base_platform
+		for platform in index:
+			rect = platform.rect
+			out += pack(rect.x,rect.y,platform.breakable*self.BREAKABLE
+				|bool(platform.bonus)*self.BONUS|(platform is base)*self.BASE)
+		for platform in self.__to_remove:
+			out += self.PENDING.pack(index[platform])
+
+
+	def restore(self, data:bytes, pos:int) -> int:
+		""" Sets the state written by snapshot() at data[pos:].
+		Platforms and bonuses are recycled (no sprite allocated once pools
+		are warm).
+		:return int: position after it.
+		"""
+		assert not self.streamer, "Snapshots need synchronous generation !"
+		self.seed,has_gauss,gauss,count,pending = self.STATE.unpack_from(data,pos)
+		pos += self.STATE.size
+		end = pos+4*self.RNG_WORDS
+		words = array("I")
+		words.frombytes(data[pos:end])
+		self.rng.setstate((Random.VERSION,tuple(words),gauss if has_gauss else None))
+		pos = end
+
+		ring = self.__platforms
+		for platform in ring.clear():
+			self._retire(platform)
+		self.__to_remove.clear()
+		platforms = []
+		end = pos+count*self.PLATFORM.size
+		for x,y,flags in self.PLATFORM.iter_unpack(data[pos:end]):
+			if flags&self.BASE:
+				platform = self.__base_platform
+			else:
+				platform = self._new_platform(x,y,
+					initial_bonus=bool(flags&self.BONUS),
+					breakable=bool(flags&self.BREAKABLE))
+			ring.append(platform)
+			platforms.append(platform)
+		pos = end
+		end = pos+pending*self.PENDING.size
+		for i, in self.PENDING.iter_unpack(data[pos:end]):
+			self.__to_remove.append(platforms[i])
+		return end
+
+
 	def reset(self) -> None:
 		" Called only when game restarts (after player death)."
-		self.__platforms = [self.__base_platform]
+		for platform in self.__platforms.clear():
+			self._retire(platform)
+		self.__to_remove.clear()
+		self.__platforms.append(self.__base_platform)
+		if self.streamer:
+			self.streamer.start(self.__base_platform.rect.y)
+
+
+	def _remove_offscreen(self, camera_y:int=None) -> None:
+		" Removes platforms below the camera (lowest are first in the ring)."
+		camera = self.camera
+		if not camera: return
+		if camera_y is None: camera_y = camera.state.y
+		bottom = camera_y + config.YWIN - self.platform_size[1]
+		for platform in self.__platforms.between(bottom+1, float("inf")):
+			self.remove_platform(platform)
+
+
+	def update(self, camera_y:int=None) -> None:
+		""" Should be called each frame in main game loop for generation.
+		:param camera_y int: camera position to remove platforms below
+			(default: the camera's, see World.advance).
+		"""
+		# check if out of screen: should be deleted
+		self._remove_offscreen(camera_y)
+		for platform in self.__to_remove:
+			if self.__platforms.remove(platform):
+				self._retire(platform)
+		self.__to_remove.clear()
+		PROFILER.begin("generation")
+		self._generation()
+		PROFILER.end("generation")
 
 
-	def update(self) -> None:
-		" Should be called each frame in main game loop for generation."
-		for platform in self.__to_remove:
-			if platform in self.__platforms:
-				self.__platforms.remove(platform)
-		self.__to_remove = []
-		asyncio.run(self._generation())
+	def visible_platforms(self, render_y:int) -> iter:
+		""" Platforms (or their bonus) inside the camera's visible band.
+		:param render_y int: camera render position.
+		"""
+		return self.__platforms.between(
+			render_y - self.platform_size[1] - Bonus.HEIGHT,
+			render_y + config.YWIN)
+
+
+	def blit_list(self, render_y:int, blits:list) -> list:
+		""" Appends (image, position) of visible platforms and bonuses,
+		for a single Surface.blits call.
+		:param render_y int: camera render position.
+		:param blits list: the sequence to append to.
+		:return list: blits.
+		"""
+		append = blits.append
+		for platform in self.visible_platforms(render_y):
+			rect = platform.rect
+			append((platform.image,(rect.x,rect.y-render_y)))
+			bonus = platform.bonus
+			if bonus:
+				rect = bonus.rect
+				append((bonus.image,(rect.x,rect.y-render_y)))
+		return blits
 
 
 	def draw(self,surface:Surface) -> None:
-		""" Called each frame in main loop, draws each platform
+		""" Called each frame in main loop, draws visible platforms
 		:param surface pygame.Surface: the surface to draw on.
 		"""
-		for platform in self.__platforms:
-			platform.draw(surface)
\ No newline at end of file
+		camera = self.camera
+		render_y = camera.render_y if camera else 0
+		surface.blits(self.blit_list(render_y,[]),False)
\ No newline at end of file
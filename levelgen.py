@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+"""
+	CopyLeft 2021 Michael Rouves
+
+	This file is part of Pygame-DoodleJump.
+	Pygame-DoodleJump is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+
+	Pygame-DoodleJump is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+	GNU Affero General Public License for more details.
+
+	You should have received a copy of the GNU Affero General Public License
+	along with Pygame-DoodleJump. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+from collections import namedtuple, deque
+import numpy as np
+from pygame.locals import KEYDOWN,K_RIGHT
+from pygame.event import Event
+
+from streaming import PlatformRecord
+from level import Bonus
+from player import Player
+import settings as config
+
+
+# Platforms below the target one a jump may start from (reachability)
+LOOKBACK = 3
+
+
+# Platform layouts of n levels (arrays of shape (n, count), spawn order):
+# y are relative to the platform below the first one (negative: upwards)
+Layouts = namedtuple("Layouts","x y bonus breakable")
+
+
+def generate(rng:np.random.Generator, n:int, count:int) -> Layouts:
+	""" Draws n layouts of count platforms like Level.create_platform.
+	:param rng numpy.random.Generator: the generator to draw from.
+	:return Layouts: the platforms of every layout.
+	"""
+	randint = rng.integers
+	distance_min,distance_max = (min(config.PLATFORM_DISTANCE_GAP),
+		max(config.PLATFORM_DISTANCE_GAP))
+	y = -np.cumsum(randint(distance_min,distance_max+1,(n,count)),axis=1)
+	x = randint(0,config.XWIN-config.PLATFORM_SIZE[0]+1,(n,count))
+	bonus = randint(0,config.BONUS_SPAWN_CHANCE+1,(n,count)) == 0
+	breakable = randint(0,config.BREAKABLE_PLATFORM_CHANCE+1,(n,count)) == 0
+	# (Platform.add_bonus: breakable platforms have no bonus)
+	return Layouts(x,y,bonus&~breakable,breakable)
+
+
+
+class JumpEnvelope:
+	"""
+	A class to represent what a jump can reach, as a lookup table.
+
+	Built once by simulating a jump with Player itself (same physics and
+	rounding): for each height gap between the launch surface and a
+	platform's top, the largest sideways distance the player can travel
+	before falling onto it (-1: out of reach).
+	Sideways moves start from a standstill when the direction key is
+	pressed on the bounce: momentum can only extend them (conservative).
+	"""
+
+	def __init__(self, force:float=config.PLAYER_JUMPFORCE):
+		self.force = force
+		width,height = config.PLAYER_SIZE
+		platform_height = config.PLATFORM_SIZE[1]
+		modulo = config.XWIN-width# (player's x wraps)
+		player = Player(0,0,*config.PLAYER_SIZE,config.PLAYER_COLOR)
+		player.jump(force)
+		player.handle_event(Event(KEYDOWN,key=K_RIGHT))
+		launch,x,travelled = player.rect.bottom,player.rect.x,0
+		reach = {}# gap -> distance
+		while True:
+			player.update()
+			travelled += (player.rect.x-x)%modulo
+			x = player.rect.x
+			h = launch-player.rect.bottom# height above launch surface
+			if h < -height-platform_height: break
+			if player._velocity.y > .5:# (Player.collisions: falling)
+				# overlapping platforms: h < gap < h+height+platform_height
+				for gap in range(max(h+1,0),h+height+platform_height):
+					reach[gap] = travelled
+		# last entry: -1 for any greater gap
+		self.table = np.full(max(reach)+2,-1,np.int64)
+		for gap,distance in reach.items():
+			self.table[gap] = distance
+
+	@property
+	def max_gap(self) -> int:
+		" Highest reachable gap (px)."
+		return int(np.flatnonzero(self.table >= 0)[-1])
+
+	def reach(self, gap:np.ndarray) -> np.ndarray:
+		" Sideways reach (px, -1: unreachable) for given height gaps."
+		return self.table[np.clip(gap,0,len(self.table)-1)]
+
+
+
+ENVELOPES = {}# force -> JumpEnvelope (built on first use)
+
+def envelope(force:float=config.PLAYER_JUMPFORCE) -> JumpEnvelope:
+	if force not in ENVELOPES:
+		ENVELOPES[force] = JumpEnvelope(force)
+	return ENVELOPES[force]
+
+
+def _sideways(x0:np.ndarray, x1:np.ndarray, width:int) -> np.ndarray:
+	""" Sideways distance needed between two surfaces of given width starting
+	at x0 and x1 (the player only has to overlap them, x wraps).
+	"""
+	modulo = config.XWIN-config.PLAYER_SIZE[0]
+	distance = np.abs(np.asarray(x0)-x1)%modulo
+	distance = np.minimum(distance,modulo-distance)
+	return np.maximum(distance-(width+config.PLAYER_SIZE[0]-2),0)
+
+
+def can_reach(x0, y0, bonus0, x1, y1) -> np.ndarray:
+	""" Whether a jump from platforms (x0,y0) reaches platforms (x1,y1),
+	from the platform or from its bonus spring (if bonus0).
+	Arguments are broadcast NumPy arrays (or numbers) of rect positions.
+	"""
+	width = config.PLATFORM_SIZE[0]
+	gap = np.asarray(y0)-y1
+	reachable = envelope().reach(gap) >= _sideways(x0,x1,width)
+	# spring: launched from the bonus top, centered on the platform
+	spring = np.asarray(x0)+width//2-Bonus.WIDTH//2
+	reachable |= bonus0 & (envelope(config.PLAYER_BONUS_JUMPFORCE).reach(
+		gap-Bonus.HEIGHT) >= _sideways(spring,x1,Bonus.WIDTH))
+	return reachable
+
+
+def reachability(layouts:Layouts, start:tuple=None,
+		lookback:int=LOOKBACK) -> tuple:
+	""" Validates layouts platform by platform (vectorized over layouts).
+	:param start tuple: (x, y, has bonus) of the platform below the first
+		one (default: the level's base platform x, y=0, no bonus).
+	:param lookback int: a platform is reachable from any of the lookback
+		reachable platforms below it.
+	:return tuple: (direct, reachable) bool arrays of layouts' shape:
+		direct: reachable from the previous platform,
+		reachable: reachable from the start through the layout.
+	"""
+	x,y,bonus,_ = layouts
+	n,count = x.shape
+	if start is None:
+		start = (config.HALF_XWIN-config.PLATFORM_SIZE[0]//2,0,False)
+	# column 0: start platform (reachable)
+	xs = np.empty((n,count+1),np.int64)
+	ys = np.empty((n,count+1),np.int64)
+	bonuses = np.empty((n,count+1),bool)
+	xs[:,0],ys[:,0],bonuses[:,0] = start
+	xs[:,1:],ys[:,1:],bonuses[:,1:] = x,y,bonus
+	reachable = np.zeros((n,count+1),bool)
+	reachable[:,0] = True
+	direct = np.zeros((n,count),bool)
+	for i in range(1,count+1):
+		for j in range(max(i-lookback,0),i):
+			link = can_reach(xs[:,j],ys[:,j],bonuses[:,j],xs[:,i],ys[:,i])
+			if j == i-1: direct[:,i-1] = link
+			reachable[:,i] |= reachable[:,j]&link
+	return direct,reachable[:,1:]
+
+
+def difficulty(layouts:Layouts, direct:np.ndarray,
+		reachable:np.ndarray) -> dict:
+	""" Difficulty statistics of validated layouts.
+	:return dict: rates are per platform, heights in px.
+	"""
+	x,y,bonus,breakable = layouts
+	n,count = x.shape
+	# height of the last platform before the first dead end (else the top)
+	dead = ~reachable
+	first = np.where(dead.any(axis=1),dead.argmax(axis=1),count)
+	heights = np.where(first > 0,-y[np.arange(n),np.maximum(first-1,0)],0)
+	return {
+		"layouts":n,
+		"platforms":n*count,
+		"unreachable_gap_rate":float(1-direct.mean()),
+		"unreachable_rate":float(dead.mean()),
+		"completable_rate":float((first == count).mean()),
+		"mean_height_before_dead_end":float(heights.mean()),
+		"mean_gap":float(-y[:,-1].mean()/count),
+		"bonus_density":float(bonus.mean()),
+		"bonus_per_1000px":float(bonus.sum()/-y[:,-1].sum()*1000),
+		"breakable_rate":float(breakable.mean())}
+
+
+
+class LayoutBank:
+	"""
+	A class to represent a source of pre-validated layouts for Level:
+	same interface as streaming.LevelStreamer, see Level(layouts=...).
+
+	Candidate chunks of platforms are generated and validated in bulk
+	above the last platform handed over (see generate and reachability):
+	the first chunk whose every platform can be reached is kept, the
+	others are rejected. No thread: this happens when pop() runs out.
+	After max_batches without a valid chunk (settings making gaps too
+	hard), a fallback chunk is used: platforms straight above the last
+	one at the smallest gap.
+	Every start() (level reset) begins a new sequence derived from the seed.
+	"""
+
+	def __init__(self, seed:int=None, chunk_size:int=config.STREAM_CHUNK_SIZE,
+			batch:int=64, max_batches:int=16):
+		"""
+		:param chunk_size int: platforms per chunk.
+		:param batch int: candidate chunks generated per refill attempt.
+		:param max_batches int: attempts per refill before the fallback.
+		"""
+		assert max_batches > 0, "At least one batch per refill !"
+		self.seed = seed
+		self.chunk_size = chunk_size
+		self.batch = batch
+		self.max_batches = max_batches
+		self.rejected = 0# chunks
+		self.accepted = 0# chunks
+		self.fallbacks = 0# chunks
+		self._epoch = 0
+		self._rng = None
+		self._records = deque()
+		self._last = None# (x, y, bonus) of the last handed over platform
+
+	@property
+	def ready(self) -> int:
+		" Records ready to be popped."
+		return len(self._records)
+
+	def start(self, start_y:int,
+			start_x:int=config.HALF_XWIN-config.PLATFORM_SIZE[0]//2) -> None:
+		""" (Re)starts the sequence above given platform.
+		:param start_y int: y of the base platform.
+		"""
+		self._epoch += 1
+		entropy = [self._epoch] if self.seed is None else [self.seed,self._epoch]
+		self._rng = np.random.default_rng(entropy)
+		self._records.clear()
+		self._last = (start_x,start_y,False)
+
+	def stop(self) -> None:
+		" (Nothing runs in the background.)"
+
+	def _fallback(self, start:tuple) -> Layouts:
+		""" A chunk straight above start at the smallest gap (one layout).
+		:param start tuple: (x, y, bonus) of the last handed over platform.
+		"""
+		n,x0 = self.chunk_size,start[0]
+		layouts = Layouts(np.full((1,n),x0,np.int64),
+			-np.arange(1,n+1)[None]*min(config.PLATFORM_DISTANCE_GAP),
+			np.zeros((1,n),bool),np.zeros((1,n),bool))
+		_,reachable = reachability(layouts,(x0,0,start[2]))
+		assert reachable.all(), "Platform distance gap out of jump reach !"
+		return layouts
+
+	def _refill(self) -> None:
+		" Hands over the first valid candidate chunk (else the fallback)."
+		x0,y0,bonus0 = self._last
+		for _ in range(self.max_batches):
+			layouts = generate(self._rng,self.batch,self.chunk_size)
+			_,reachable = reachability(layouts,(x0,0,bonus0))
+			valid = np.flatnonzero(reachable.all(axis=1))
+			if len(valid):
+				i = valid[0]
+				self.rejected += int(i)
+				self.accepted += 1
+				break
+			self.rejected += self.batch
+		else:
+			layouts,i = self._fallback((x0,0,bonus0)),0
+			self.fallbacks += 1
+		x,y,bonus,breakable = (a[i].tolist() for a in layouts)
+		for record in zip(x,[y0+dy for dy in y],bonus,breakable):
+			self._records.append(PlatformRecord(*record))
+		self._last = self._records[-1][:3]
+
+	def generate(self, count:int) -> None:
+		""" Refills until count records are ready.
+		:param count int: records needed.
+		"""
+		while len(self._records) < count:
+			self._refill()
+
+	def pop(self) -> PlatformRecord:
+		" Next platform layout (never None once started)."
+		if not self._records:
+			self._refill()
+		return self._records.popleft()
+
+
+
+
+if __name__ == "__main__":
+	from argparse import ArgumentParser
+	from time import perf_counter
+	parser = ArgumentParser(description="Offline level generator: "
+		"reachability and difficulty statistics")
+	parser.add_argument("--layouts",type=int,default=1<<20)
+	parser.add_argument("--platforms",type=int,default=64,
+		help="platforms per layout")
+	parser.add_argument("--batch",type=int,default=1<<14,
+		help="layouts generated at once")
+	parser.add_argument("--seed",type=int,default=0)
+	parser.add_argument("--gap",type=int,nargs=2,metavar=("MIN","MAX"),
+		default=config.PLATFORM_DISTANCE_GAP,
+		help="platform distance gap to evaluate (default: settings.py)")
+	args = parser.parse_args()
+	config.PLATFORM_DISTANCE_GAP = tuple(args.gap)
+	for force in (config.PLAYER_JUMPFORCE,config.PLAYER_BONUS_JUMPFORCE):
+		print(f"jump force {force}: highest reachable gap "
+			f"{envelope(force).max_gap} px")
+	rng = np.random.default_rng(args.seed)
+	totals,done,start = {},0,perf_counter()
+	while done < args.layouts:
+		n = min(args.batch,args.layouts-done)
+		layouts = generate(rng,n,args.platforms)
+		for key,value in difficulty(layouts,*reachability(layouts)).items():
+			totals[key] = totals.get(key,0)+value*n
+		done += n
+	elapsed = perf_counter()-start
+	print(f"{done} layouts, {done*args.platforms} platforms in {elapsed:.1f} s "
+		f"({done*args.platforms/elapsed:.0f} platforms/s)")
+	for key,value in totals.items():
+		if key not in ("layouts","platforms"):
+			print(f"{key:>28}: {value/done:.6g}")
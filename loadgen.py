@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+	CopyLeft 2021 Michael Rouves
+
+	This file is part of Pygame-DoodleJump.
+	Pygame-DoodleJump is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+
+	Pygame-DoodleJump is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+	GNU Affero General Public License for more details.
+
+	You should have received a copy of the GNU Affero General Public License
+	along with Pygame-DoodleJump. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+from random import Random
+from time import perf_counter
+import asyncio
+
+from server import HELLO, INPUT, ACK, TICK, ADDED, REMOVED, ClientView
+from replay import KEYUP_FLAG
+import settings as config
+
+
+# replay.KEYS indexes
+LEFT,RIGHT,RETURN = range(3)
+
+
+
+class LoadStats:
+	" Measurements of every simulated client."
+
+	def __init__(self):
+		self.intervals = []# between consecutive ticks received (s)
+		self.latencies = []# input sent -> first tick applying it (s)
+		self.ticks = 0
+		self.bytes = 0
+		self.sessions = 0
+
+	@staticmethod
+	def percentiles(values:list) -> tuple:
+		" (p50, p99, max) of values."
+		if not values: return (0.,0.,0.)
+		values = sorted(values)
+		return (values[len(values)//2],values[int(len(values)*.99)],values[-1])
+
+	def print(self, period:float, elapsed:float) -> None:
+		jitter = [abs(i-period) for i in self.intervals]
+		print(f"{self.sessions} sessions, {self.ticks} ticks in {elapsed:.1f} s "
+			f"({self.ticks/elapsed:.0f} ticks/s, "
+			f"{self.bytes/max(self.ticks,1):.1f} bytes/tick)")
+		print("tick jitter   p50 {:7.2f} ms  p99 {:7.2f} ms  max {:7.2f} ms".format(
+			*(v*1e3 for v in self.percentiles(jitter))))
+		print("input latency p50 {:7.2f} ms  p99 {:7.2f} ms  max {:7.2f} ms".format(
+			*(v*1e3 for v in self.percentiles(self.latencies))))
+
+
+
+async def client(stats:LoadStats, seed:int, duration:float,
+		host:str=config.SERVER_HOST, port:int=config.SERVER_PORT,
+		path:str=None, input_every:int=16) -> None:
+	""" One simulated player: random left/right inputs, restarts when dead,
+	acks every tick.
+	:param duration float: seconds to play.
+	:param input_every int: ticks between direction changes.
+	"""
+	if path:
+		reader,writer = await asyncio.open_unix_connection(path)
+	else:
+		reader,writer = await asyncio.open_connection(host,port)
+	writer.write(HELLO.pack(b"H",seed))
+	stats.sessions += 1
+	rng = Random(seed)
+	view = ClientView()
+	sent = {}# input sequence -> send time
+	sequence,held,last = 0,None,None
+	end = perf_counter()+duration
+	try:
+		while perf_counter() < end:
+			header = await reader.readexactly(TICK.size)
+			(_,tick,base,applied,x,y,vx,vy,score,dead,
+				added,removed) = TICK.unpack(header)
+			size = added*ADDED.size
+			body = await reader.readexactly(size+removed*REMOVED.size)
+			view.apply(tick,base,ADDED.iter_unpack(body[:size]),
+				(y for y, in REMOVED.iter_unpack(body[size:])))
+			now = perf_counter()
+			stats.ticks += 1
+			stats.bytes += len(header)+len(body)
+			if last is not None:
+				stats.intervals.append(now-last)
+			last = now
+			for seq in [s for s in sent if s <= applied]:
+				stats.latencies.append(now-sent.pop(seq))
+
+			messages = [ACK.pack(b"A",tick)]
+			keys = []
+			if dead:
+				keys.append(RETURN)
+			elif not tick%input_every:
+				if held is not None:
+					keys.append(held|KEYUP_FLAG)
+				held = rng.choice((LEFT,RIGHT,None))
+				if held is not None:
+					keys.append(held)
+			for code in keys:
+				sequence += 1
+				sent[sequence] = now
+				messages.append(INPUT.pack(b"I",sequence,code))
+			writer.write(b"".join(messages))
+	finally:
+		writer.close()
+
+
+async def load(sessions:int, duration:float, seed:int=0, **kwargs) -> LoadStats:
+	""" Runs simulated players concurrently (connections spread over 1 s).
+	:param sessions int: number of clients.
+	:param duration float: seconds each client plays.
+	"""
+	stats = LoadStats()
+	async def delayed(i):
+		await asyncio.sleep(i/sessions)
+		await client(stats,seed+i,duration,**kwargs)
+	await asyncio.gather(*(delayed(i) for i in range(sessions)))
+	return stats
+
+
+
+
+if __name__ == "__main__":
+	from argparse import ArgumentParser
+	parser = ArgumentParser(description="Load generator for server.py")
+	parser.add_argument("--sessions",type=int,default=100)
+	parser.add_argument("--seconds",type=float,default=10)
+	parser.add_argument("--seed",type=int,default=0)
+	parser.add_argument("--host",default=config.SERVER_HOST)
+	parser.add_argument("--port",type=int,default=config.SERVER_PORT)
+	parser.add_argument("--unix",metavar="PATH",help="connect to a Unix socket")
+	parser.add_argument("--tick-rate",type=int,default=config.SERVER_TICK_RATE,
+		help="server tick rate (to compute jitter)")
+	args = parser.parse_args()
+	start = perf_counter()
+	stats = asyncio.run(load(args.sessions,args.seconds,args.seed,
+		host=args.host,port=args.port,path=args.unix))
+	stats.print(1/args.tick_rate,perf_counter()-start)
@@ -19,11 +19,18 @@
 
 
 import pygame, sys
+from argparse import ArgumentParser
+from time import perf_counter
 
 from singleton import Singleton
-from camera import Camera
-from player import Player
-from level import Level
+from world import World
+from render import DirtyRenderer
+from hud import GlyphAtlas, NumberText, TextCache
+from replay import Recorder, Recording
+from capture import FrameCapture
+from pacing import FramePacer
+from inputs import KeyboardSource, ScriptedSource, AgentSource, LatencyTracker
+from profiler import PROFILER
 import settings as config
 
 
@@ -33,96 +40,218 @@ class Game(Singleton):
 	A class to represent the game.
 
 	used to manage game updates, draw calls and user input events.
+	Runs one World in the window (one window: one game per process).
 	Can be access via Singleton: Game.instance .
 	(Check Singleton design pattern for more info)
 	"""
 
 	# constructor called on new instance: Game()
-	def __init__(self) -> None:
+	def __init__(self, dirty_rects:bool=config.DIRTY_RECTS, seed:int=None,
+			record:bool=False, headless:bool=False,
+			capture:FrameCapture=None) -> None:
 		
 		# ============= Initialisation =============
 		self.__alive = True
-		# Window / Render
-		self.window = pygame.display.set_mode(config.DISPLAY,config.FLAGS)
+		# Window / Render (headless: simulation only, nothing is drawn)
+		self.headless = headless
+		self.window = None
+		if not headless:
+			self.window = pygame.display.set_mode(config.DISPLAY,config.FLAGS)
 		self.clock = pygame.time.Clock()
+		self.pacer = FramePacer(clock=self.clock)
+		self.renderer = None
+		if dirty_rects and not headless:
+			self.renderer = DirtyRenderer(self.window)
 
-		# Instances
-		self.camera = Camera()
-		self.lvl = Level()
-		self.player = Player(
-			config.HALF_XWIN - config.PLAYER_SIZE[0]/2,# X POS
-			config.HALF_YWIN + config.HALF_YWIN/2,#      Y POS
-			*config.PLAYER_SIZE,# SIZE
-			config.PLAYER_COLOR#  COLOR
-		)
+		self._blits = []# (surface, position) sequence reused each frame
+		# Input sources polled each loop (see inputs.py), latency measures
+		self.inputs = [] if headless else [KeyboardSource()]
+		self.latency = None
+		# rendered frames recording (see capture.py)
+		self.capture = capture
+
+		# Simulation (camera, level, player), input recording (see replay.py)
+		if getattr(self,"world",None):
+			self.world.close()# (Singleton re-initialized)
+		self.world = World(seed)
+		self.recorder = Recorder(self.world.seed) if record else None
 
 		# User Interface
-		self.score = 0
-		self.score_txt = config.SMALL_FONT.render("0 m",1,config.GRAY)
 		self.score_pos = pygame.math.Vector2(10,10)
+		if headless:# (no font loaded)
+			self.text_cache = self.score_hud = self.score_txt = None
+			self.gameover_txt = self.gameover_rect = None
+			return
+		self.text_cache = TextCache()
+		self.score_hud = NumberText(
+			GlyphAtlas(config.SMALL_FONT,config.GRAY)," m")
+		self.score_txt = self.score_hud.render(self.score)
 
-		self.gameover_txt = config.LARGE_FONT.render("Game Over",1,config.GRAY)
+		self.gameover_txt = self.text_cache.render(
+			config.LARGE_FONT,"Game Over",config.GRAY)
 		self.gameover_rect = self.gameover_txt.get_rect(
 			center=(config.HALF_XWIN,config.HALF_YWIN))
 	
 	
+	# Shortcuts to the world's state
+	@property
+	def camera(self):return self.world.camera
+	@property
+	def lvl(self):return self.world.lvl
+	@property
+	def player(self):return self.world.player
+	@property
+	def steps(self) -> int:return self.world.steps
+	@property
+	def death_step(self) -> int:return self.world.death_step
+	@property
+	def score(self) -> int:return self.world.score
+
+
 	def close(self):
 		self.__alive = False
 
 
 	def reset(self):
-		self.camera.reset()
-		self.lvl.reset()
-		self.player.reset()
+		self.world.reset()
+
+
+	def handle_event(self, event:pygame.event.Event) -> None:
+		""" Called foreach user input event (before next update).
+		:param event pygame.Event: user input event
+		"""
+		if self.recorder:
+			self.recorder.record(self.steps,event)
+		if event.type == pygame.QUIT:
+			self.close()
+		elif event.type == pygame.KEYDOWN:
+			if event.key == pygame.K_ESCAPE:
+				self.close()
+			if event.key == pygame.K_RETURN and self.player.dead:
+				self.reset()
+			if event.key == pygame.K_F3:
+				PROFILER.toggle_overlay()
+		self.world.handle_event(event)
 
 
 	def _event_loop(self):
 		# ---------- User Events ----------
-		for event in pygame.event.get():
-			if event.type == pygame.QUIT:
-				self.close()
-			elif event.type == pygame.KEYDOWN:
-				if event.key == pygame.K_ESCAPE:
-					self.close()
-				if event.key == pygame.K_RETURN and self.player.dead:
-					self.reset()
-			self.player.handle_event(event)
+		for source in self.inputs:
+			for event in source.poll(self):
+				if self.latency:
+					self.latency.input(event,self.player)
+				self.handle_event(event)
 
 
-	def _update_loop(self):
+	def _update_loop(self, dt:float=1.):
 		# ----------- Update -----------
-		self.player.update()
-		self.lvl.update()
-
-		if not self.player.dead:
-			self.camera.update(self.player.rect)
-			#calculate score and update UI txt
-			self.score=-self.camera.state.y//50
-			self.score_txt = config.SMALL_FONT.render(
-				str(self.score)+" m", 1, config.GRAY)
+		# (dt: simulated frames, see Player.update)
+		self.world.update(dt)
+		if self.latency:
+			self.latency.updated(self.player)
+		if not self.player.dead and self.score_hud:
+			#update UI txt
+			self.score_txt = self.score_hud.render(self.score)
 	
 
-	def _render_loop(self):
-		# ----------- Display -----------
-		self.window.fill(config.WHITE)
-		self.lvl.draw(self.window)
-		self.player.draw(self.window)
+	def _drawn_rects(self) -> list:
+		" Screen areas covered by the last frame (for dirty rendering)."
+		rects = [self.player.camera_rect,
+			self.score_txt.get_rect(topleft=self.score_pos)]
+		for platform in self.lvl.visible_platforms(self.camera.render_y):
+			rects.append(platform.camera_rect)
+			if platform.bonus:
+				rects.append(platform.bonus.camera_rect)
+		if self.player.dead:
+			rects.append(self.gameover_rect)
+		if PROFILER.overlay:
+			rects.append(PROFILER.overlay_rect())
+		return rects
 
-		# User Interface
+
+	def _render_loop(self, alpha:float=1.):
+		""" Draws the frame.
+		:param alpha float: interpolation between last and current update.
+		"""
+		# ----------- Display -----------
+		if self.headless: return
+		self.camera.interpolate(alpha)
+		if self.renderer:
+			self.renderer.begin(self.camera.render_y)# erase last frame
+		else:
+			self.window.fill(config.WHITE)
+		# one blits call: visible platforms, bonuses, player then UI
+		blits = self.lvl.blit_list(self.camera.render_y,self._blits)
+		blits.append(self.player.blit_item(alpha))
 		if self.player.dead:
-			self.window.blit(self.gameover_txt,self.gameover_rect)# gameover txt
-		self.window.blit(self.score_txt, self.score_pos)# score txt
+			blits.append((self.gameover_txt,self.gameover_rect))# gameover txt
+		blits.append((self.score_txt,self.score_pos))# score txt
+		self.window.blits(blits,False)
+		blits.clear()
+		PROFILER.draw(self.window)# (if overlay shown)
+		if self.capture:
+			PROFILER.begin("capture")
+			self.capture.capture(self.window)
+			PROFILER.end("capture")
 
-		pygame.display.update()# window update
-		self.clock.tick(config.FPS)# max loop/s
+		# window update
+		if self.renderer:
+			self.renderer.end(self._drawn_rects())
+		else:
+			pygame.display.update()
+		if self.latency:
+			self.latency.displayed()
 
 
-	def run(self):
+	def run(self, fast_forward:bool=False, render_every:int=1,
+			max_steps:int=None) -> None:
+		""" Main game loop.
+		Physics run at a fixed timestep (config.TIMESTEP): several steps per
+		rendered frame if rendering is slow, interpolated if it is fast.
+		Frames are paced by self.pacer, which skips renders when behind.
+		:param fast_forward bool: step as fast as possible (no frame limit).
+		:param render_every int: in fast forward, render one step out of K
+			(0: never render).
+		:param max_steps int: stop after this many steps (default: never).
+		"""
 		# ============= MAIN GAME LOOP =============
-		while self.__alive:
+		steps = 0
+		accumulator,last = 0.,perf_counter()
+		while self.__alive and (max_steps is None or steps<max_steps):
+			PROFILER.next_frame()
+			PROFILER.begin("events")
 			self._event_loop()
-			self._update_loop()
-			self._render_loop()
+			PROFILER.end("events")
+			if fast_forward:
+				PROFILER.begin("update")
+				self._update_loop()
+				PROFILER.end("update")
+				steps += 1
+				if render_every and not steps%render_every:
+					PROFILER.begin("render")
+					self._render_loop()
+					PROFILER.end("render")
+				continue
+			# accumulate elapsed time (limited so a stall can't spiral)
+			now = perf_counter()
+			accumulator += min(now-last,
+				config.MAX_STEPS_PER_FRAME*config.TIMESTEP)
+			last = now
+			PROFILER.begin("update")
+			while accumulator >= config.TIMESTEP:
+				self._update_loop()
+				accumulator -= config.TIMESTEP
+				steps += 1
+			PROFILER.end("update")
+			PROFILER.begin("render")
+			if self.pacer.should_render():# (else frame over budget)
+				start = perf_counter()
+				self._render_loop(accumulator/config.TIMESTEP)
+				self.pacer.rendered_in(perf_counter()-start)
+			PROFILER.end("render")
+			self.pacer.wait()# max loop/s
+		if self.capture:
+			self.capture.close()
 		pygame.quit()
 
 
@@ -130,6 +259,71 @@ class Game(Singleton):
 
 if __name__ == "__main__":
 	# ============= PROGRAM STARTS HERE =============
-	game = Game()
-	game.run()
+	parser = ArgumentParser(description="Pygame DoodleJump")
+	parser.add_argument("--fast-forward",action="store_true",
+		help="run the simulation as fast as possible")
+	parser.add_argument("--render-every",type=int,default=1,metavar="K",
+		help="in fast forward, render one step out of K (0: never)")
+	parser.add_argument("--steps",type=int,default=None,
+		help="quit after this many simulation steps")
+	parser.add_argument("--seed",type=int,default=None,
+		help="level generation seed")
+	parser.add_argument("--record",metavar="PATH",
+		help="save inputs to PATH on exit (play it with replay.py)")
+	parser.add_argument("--agent",metavar="MODULE:CALLABLE",
+		help="play with an agent (see tournament.py), keyboard still works")
+	parser.add_argument("--script",metavar="PATH",
+		help="play the inputs of a recording (see --record) in real time")
+	parser.add_argument("--latency",action="store_true",
+		help="print input to update/display latencies on exit")
+	parser.add_argument("--pacing",choices=("tick","busy","hybrid"),
+		default=config.PACING,help="frame wait: sleep (tick), spin (busy) "
+		"or sleep then spin (hybrid)")
+	parser.add_argument("--frame-skip",type=int,default=config.MAX_FRAME_SKIP,
+		metavar="N",help="renders skipped in a row at most when behind")
+	parser.add_argument("--pacing-stats",action="store_true",
+		help="print achieved FPS, skipped renders and pacing error on exit")
+	parser.add_argument("--capture",metavar="PATH",
+		help="record rendered frames to PATH (see --capture-format)")
+	parser.add_argument("--capture-format",choices=("png","raw","zlib"),
+		default=config.CAPTURE_FORMAT,help="PATH: png directory or frame stream")
+	parser.add_argument("--capture-policy",choices=("drop","block"),
+		default=config.CAPTURE_POLICY,
+		help="when the writer is behind: drop frames or wait for it")
+	parser.add_argument("--profile",metavar="PATH",
+		help="profile frames (F3: overlay), save them to PATH (.csv/.json) on exit")
+	args = parser.parse_args()
+	capture = None
+	if args.capture:
+		capture = FrameCapture(args.capture,format=args.capture_format,
+			policy=args.capture_policy)
+	seed = args.seed
+	if args.script:
+		recording = Recording.load(args.script)
+		if seed is None: seed = recording.seed
+	game = Game(seed=seed,record=bool(args.record),capture=capture)
+	if args.script:
+		game.inputs.append(ScriptedSource(recording.events))
+	if args.agent:
+		from tournament import load_agent
+		game.inputs.append(AgentSource(load_agent(args.agent)))
+	if args.latency:
+		game.latency = LatencyTracker()
+	game.pacer = FramePacer(mode=args.pacing,max_skip=args.frame_skip,
+		clock=game.clock)
+	PROFILER.enable(bool(args.profile))
+	game.run(args.fast_forward,args.render_every,args.steps)
+	if args.profile:
+		PROFILER.dump(args.profile)
+	if game.capture:
+		print(game.capture.stats())
+	if game.latency:
+		print(game.latency.report())
+	if args.pacing_stats:
+		print("{fps:.1f} FPS, {render_fps:.1f} rendered, {skipped} skipped, "
+			"pacing error mean {error_mean:.2f} p50 {error_p50:.2f} "
+			"p99 {error_p99:.2f} ms".format(**game.pacer.stats()))
+	if args.record:
+		game.recorder.finish(game.steps,game.score,game.death_step)
+		game.recorder.save(args.record)
 
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+	CopyLeft 2021 Michael Rouves
+
+	This file is part of Pygame-DoodleJump.
+	Pygame-DoodleJump is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+
+	Pygame-DoodleJump is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+	GNU Affero General Public License for more details.
+
+	You should have received a copy of the GNU Affero General Public License
+	along with Pygame-DoodleJump. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+import numpy as np
+import pygame
+from pygame import Surface
+
+import settings as config
+
+
+# Rows of Observer.features (4 columns each)
+#   player:   x, y, velocity x, velocity y
+#   platform: x, y, breakable, 1
+#   bonus:    x, y, jump force, 1
+# y are relative to the camera, missing platforms/bonuses are rows of 0.
+FEATURE_COLUMNS = 4
+
+
+
+class Observer:
+	"""
+	A class to represent per-step observations of a game (for learning agents).
+
+	Pixels are rendered offscreen into a surface that wraps a preallocated
+	NumPy array (pygame.image.frombuffer): the array returned by pixels() is
+	the frame itself, never copied nor locked.
+	Features are written in place into a preallocated float32 array.
+	Returned arrays are overwritten by the next call: copy them to keep them.
+	"""
+
+	def __init__(self, game, size:tuple=None,
+			platforms:int=config.OBSERVATION_PLATFORMS,
+			bonuses:int=config.OBSERVATION_BONUSES):
+		"""
+		:param game main.Game: the game to observe (can be headless).
+		:param size tuple: (width, height) of pixel observations
+			(default: window size, else the frame is scaled down).
+		:param platforms int: nearest platforms in features.
+		:param bonuses int: nearest bonuses in features.
+		"""
+		self.game = game
+		self.size = tuple(size or config.DISPLAY)
+		self.platforms = platforms
+		self.bonuses = bonuses
+		# frame buffer: (height, width, RGBX) bytes shared with a surface
+		w,h = self.size
+		self._buffer = np.zeros((h,w,4),np.uint8)
+		self._surface = pygame.image.frombuffer(self._buffer,self.size,"RGBX")
+		self._pixels = self._buffer[:,:,:3]
+		# full size surface drawn on, then scaled down (if needed)
+		self._canvas = self._surface
+		if self.size != tuple(config.DISPLAY):
+			self._canvas = Surface(config.DISPLAY)
+		self._features = np.zeros((1+platforms+bonuses,FEATURE_COLUMNS),np.float32)
+
+	@property
+	def feature_shape(self) -> tuple:
+		return self._features.shape
+
+	def pixels(self) -> np.ndarray:
+		""" Renders current state (no UI) and returns it.
+		:return numpy.ndarray: (height, width, 3) uint8 view of the frame.
+		"""
+		game,canvas = self.game,self._canvas
+		canvas.fill(config.WHITE)
+		game.lvl.draw(canvas)
+		# (untracked: the window's dirty rects rely on the player's last draw)
+		canvas.blit(*game.player.blit_item(track=False))
+		if canvas is not self._surface:
+			pygame.transform.scale(canvas,self.size,self._surface)
+		return self._pixels
+
+	def features(self) -> np.ndarray:
+		""" Fills the feature array with current state and returns it.
+		:return numpy.ndarray: (1+platforms+bonuses, 4) float32 array.
+		"""
+		game,out = self.game,self._features
+		cam_y = game.camera.state.y
+		player = game.player
+		row = out[0]
+		row[0] = player.rect.x
+		row[1] = player.rect.y-cam_y
+		row[2] = player._velocity.x
+		row[3] = player._velocity.y
+		p,b = 1,1+self.platforms# next platform/bonus rows
+		p_end,b_end = b,len(out)
+		for plt in game.lvl.nearest_platforms(player.rect.y):
+			if p < p_end:
+				row = out[p]
+				row[0] = plt.rect.x
+				row[1] = plt.rect.y-cam_y
+				row[2] = plt.breakable
+				row[3] = 1
+				p += 1
+			bonus = plt.bonus
+			if bonus and b < b_end:
+				row = out[b]
+				row[0] = bonus.rect.x
+				row[1] = bonus.rect.y-cam_y
+				row[2] = bonus.force
+				row[3] = 1
+				b += 1
+			if p == p_end and b == b_end:
+				break
+		out[p:p_end] = 0
+		out[b:b_end] = 0
+		return out
+
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+	CopyLeft 2021 Michael Rouves
+
+	This file is part of Pygame-DoodleJump.
+	Pygame-DoodleJump is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+
+	Pygame-DoodleJump is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+	GNU Affero General Public License for more details.
+
+	You should have received a copy of the GNU Affero General Public License
+	along with Pygame-DoodleJump. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+from collections import deque
+from time import perf_counter, sleep
+import pygame
+
+import settings as config
+
+
+MODES = ("tick","busy","hybrid")
+
+
+
+class FramePacer:
+	"""
+	A class to represent the pacing of Game.run's loop.
+
+	Frames last 1/fps. A frame longer than budget loses simulated time:
+	Game.run catches up config.MAX_STEPS_PER_FRAME steps at most, then the
+	game slows down. So rendering (never updating) is skipped when it would
+	not fit in what is left of the budget, estimated from the last renders,
+	at most max_skip times in a row. wait() ends the frame:
+		"tick":   pygame.time.Clock.tick (sleeps, ~1 ms granularity)
+		"busy":   Clock.tick_busy_loop (precise, spins a whole core)
+		"hybrid": sleeps until spin seconds before the deadline, then spins
+	"""
+
+	def __init__(self, fps:int=config.FPS, mode:str=config.PACING,
+			max_skip:int=config.MAX_FRAME_SKIP, spin:float=config.PACING_SPIN,
+			clock:pygame.time.Clock=None,
+			budget:float=config.MAX_STEPS_PER_FRAME*config.TIMESTEP):
+		"""
+		:param mode str: one of MODES.
+		:param max_skip int: renders skipped in a row at most (0: never).
+		:param spin float: hybrid pacing: busy wait duration (s).
+		:param clock pygame.time.Clock: clock of "tick" and "busy" modes.
+		:param budget float: longest frame without slowing the game (s).
+		"""
+		assert mode in MODES, "Unknown pacing mode !"
+		self.fps = fps
+		self.period = 1/fps
+		self.mode = mode
+		self.max_skip = max_skip
+		self.spin = spin
+		self.budget = budget
+		self.clock = clock or pygame.time.Clock()
+		self.frames = 0
+		self.rendered = 0
+		self.skipped = 0# renders skipped
+		self.errors = deque(maxlen=10*fps)# frame duration - period (s)
+		self.__start = self.__last = None# (first frame, last wait end)
+		self.__deadline = None# end of current frame (hybrid mode)
+		self.__render = 0.# estimated render duration (moving average)
+		self.__skips = 0# renders skipped in a row
+
+	def should_render(self) -> bool:
+		" Whether this frame still has time to render (else counts a skip)."
+		if (self.__last is None or self.__skips >= self.max_skip
+				or perf_counter()+self.__render <= self.__last+self.budget):
+			return True
+		self.skipped += 1
+		self.__skips += 1
+		return False
+
+	def rendered_in(self, duration:float) -> None:
+		" Reports a render and its duration (s)."
+		self.__render += (duration-self.__render)*.1
+		self.__skips = 0
+		self.rendered += 1
+
+	def wait(self) -> None:
+		" Ends the frame: waits for the next one, like Clock.tick."
+		if self.mode == "hybrid":
+			if self.__deadline is None:
+				self.__deadline = perf_counter()+self.period
+			deadline = self.__deadline
+			delay = deadline-perf_counter()-self.spin
+			if delay > 0: sleep(delay)
+			while perf_counter() < deadline:
+				pass
+			now = perf_counter()
+			# absolute schedule, restarted if a whole frame late
+			if now > deadline+self.period: deadline = now
+			self.__deadline = deadline+self.period
+		else:
+			if self.mode == "busy":
+				self.clock.tick_busy_loop(self.fps)
+			else:
+				self.clock.tick(self.fps)
+			now = perf_counter()
+		if self.__last is not None:
+			self.errors.append(now-self.__last-self.period)
+		else:
+			self.__start = now
+		self.__last = now
+		self.frames += 1
+
+	def stats(self) -> dict:
+		""" Pacing summary.
+		:return dict: loop and render FPS, skipped renders,
+			pacing error (ms): mean, p50 and p99 of |duration-period|.
+		"""
+		elapsed = (self.__last-self.__start) if self.frames > 1 else 0.
+		errors = sorted(abs(e) for e in self.errors) or [0.]
+		return {
+			"fps":(self.frames-1)/elapsed if elapsed else 0.,
+			"render_fps":self.rendered/elapsed if elapsed else 0.,
+			"skipped":self.skipped,
+			"error_mean":sum(errors)/len(errors)*1e3,
+			"error_p50":errors[len(errors)//2]*1e3,
+			"error_p99":errors[int(len(errors)*.99)]*1e3}
@@ -18,15 +18,16 @@
 """
 
 
-from math import copysign
+from math import copysign, inf
+import struct
+from pygame import Rect, Surface
 from pygame.math import Vector2
 from pygame.locals import KEYDOWN,KEYUP,K_LEFT,K_RIGHT
 from pygame.sprite import collide_rect
 from pygame.event import Event
 
-from singleton import Singleton
 from sprite import Sprite
-from level import Level
+from profiler import PROFILER
 import settings as config
 
 
@@ -34,21 +35,64 @@ import settings as config
 #Return the sign of a number: getsign(-5)-> -1
 getsign = lambda x : copysign(1, x)
 
-class Player(Sprite, Singleton):
+
+def _overlap_times(p:float, d:float, size:int, lo:int, hi:int) -> tuple:
+	" Open time interval where segment [p+d*t, p+d*t+size] overlaps (lo,hi)."
+	if not d:
+		return (-inf,inf) if p < hi and p+size > lo else None
+	t0,t1 = (lo-p-size)/d, (hi-p)/d
+	return (t0,t1) if d > 0 else (t1,t0)
+
+
+def sweep(x:float, y:float, dx:float, dy:float, size:tuple, rect:Rect,
+		modulo:int) -> float:
+	""" Swept AABB: first time a box moving by (dx,dy) overlaps rect.
+	:param x,y float: start position of the box.
+	:param size tuple: box size.
+	:param rect pygame.Rect: the static box.
+	:param modulo int: x-axis wrap (positions are x%modulo, |dx|<modulo).
+	:return float: time from 0 (start) to 1 (end), None if no overlap.
+	"""
+	ty = _overlap_times(y,dy,size[1],rect.top,rect.bottom)
+	if not ty: return None
+	first = None
+	for shift in (-modulo,0,modulo):# rect's images around the wrap
+		tx = _overlap_times(x,dx,size[0],rect.left+shift,rect.right+shift)
+		if not tx: continue
+		entry,leave = max(tx[0],ty[0]),min(tx[1],ty[1])
+		if entry < leave and entry < 1 and leave > 0:
+			entry = max(entry,0.)
+			if first is None or entry < first:
+				first = entry
+	return first
+
+
+class Player(Sprite):
 	"""
 	A class to represent the player.
 	
 	Manages player's input,physics (movement...).
-	Can be access via Singleton: Player.instance.
-	(Check Singleton design pattern for more info).
+	Owned by a World (see world.py): collides with the world's level.
 	"""
+	__slots__ = ("level","__camera","__startrect","__lastpos","__drawnrect","__maxvelocity",
+		"__startspeed","_velocity","_input","_jumpforce","_bonus_jumpforce",
+		"gravity","accel","deccel","dead","swept","peak")
+	# snapshot: rect x, y, position before last update x, y,
+	# velocity x, y (exact), input, dead, peak
+	STATE = struct.Struct("<iiiiddbBi")
+
 	# (Overriding Sprite.__init__ constructor)
-	def __init__(self,*args):
+	def __init__(self,*args,level=None,camera=None):
 		#calling default Sprite constructor
 		Sprite.__init__(self,*args)
+		self.level = level# (None: nothing to collide with)
+		self.__camera = camera
+		self.__drawnrect = None# last render position (interpolated)
 		self.__startrect = self.rect.copy()
-		self.__maxvelocity = Vector2(config.PLAYER_MAX_SPEED,100)
-		self.__startspeed = 1.5
+		self.__lastpos = self.rect.topleft# before last update (interpolation)
+		self.__maxvelocity = Vector2(config.PLAYER_MAX_SPEED,
+			config.PLAYER_MAX_FALL_SPEED)
+		self.__startspeed = config.PLAYER_START_SPEED
 
 		self._velocity = Vector2()
 		self._input = 0
@@ -56,11 +100,19 @@ class Player(Sprite, Singleton):
 		self._bonus_jumpforce = config.PLAYER_BONUS_JUMPFORCE
 
 		self.gravity = config.GRAVITY
-		self.accel = .5
-		self.deccel = .6
+		self.accel = config.PLAYER_ACCEL
+		self.deccel = config.PLAYER_DECCEL
 		self.dead = False
+		# continuous collisions (always used by steps longer than a frame)
+		self.swept = config.SWEPT_COLLISIONS
+		self.peak = self.rect.y# highest y reached by last update
 	
 
+	@property
+	def camera(self):
+		return self.__camera
+
+
 	def _fix_velocity(self) -> None:
 		""" Set player's velocity between max/min.
 		Should be called in Player.update().
@@ -75,10 +127,43 @@ class Player(Sprite, Singleton):
 		" Called only when game restarts (after player death)."
 		self._velocity = Vector2()
 		self.rect = self.__startrect.copy()
-		self.camera_rect = self.__startrect.copy()
+		self.__drawnrect = None
+		self.__lastpos = self.rect.topleft
+		self.peak = self.rect.y
 		self.dead = False
 
 
+	def snapshot(self, out:bytearray) -> None:
+		" Appends the player state to a World snapshot."
+		out += self.STATE.pack(*self.rect.topleft,*self.__lastpos,
+			*self._velocity,self._input,self.dead,self.peak)
+
+
+	def restore(self, data:bytes, pos:int) -> int:
+		""" Sets the state written by snapshot() at data[pos:].
+		:return int: position after it.
+		"""
+		(x,y,lastx,lasty,vx,vy,self._input,dead,
+			self.peak) = self.STATE.unpack_from(data,pos)
+		self.rect.topleft = x,y
+		self.__lastpos = lastx,lasty
+		self._velocity.update(vx,vy)
+		self.dead = bool(dead)
+		self.__drawnrect = None
+		return pos+self.STATE.size
+
+
+	def set_motion(self, position:tuple, velocity:tuple,
+			last_position:tuple) -> None:
+		""" Sets the result of updates computed elsewhere (see World.advance).
+		:param last_position tuple: position before the last update.
+		"""
+		self.rect.topleft = position
+		self._velocity.update(velocity)
+		self.__lastpos = last_position
+		self.peak = self.rect.y
+
+
 	def handle_event(self,event:Event) -> None:
 		""" Called in main loop foreach user input event.
 		:param event pygame.Event: user input event
@@ -113,9 +198,10 @@ class Player(Sprite, Singleton):
 		""" Checks for collisions with level.
 		Should be called in Player.update().
 		"""
-		lvl = Level.instance
+		lvl = self.level
 		if not lvl: return
-		for platform in lvl.platforms:
+		# only platforms at player's height can collide
+		for platform in lvl.platforms_near(self.rect):
 			# check falling and colliding <=> isGrounded ?
 			if self._velocity.y > .5:
 				# check collisions with platform's spring bonus
@@ -129,25 +215,146 @@ class Player(Sprite, Singleton):
 					platform.onCollide()
 
 
-	def update(self) -> None:
+	def swept_collisions(self, path:list) -> list:
+		""" Continuous collisions along the last move (from __lastpos):
+		the path is split at each frame and the earliest platform or bonus
+		hit while falling is resolved at that frame (like per-frame
+		collisions would, without tunneling), then the rest of the move
+		is redone from the bounce and swept again.
+		Should be called in Player.update().
+		:param path list: (x, y, velocity x, velocity y) after each frame
+			of the last move (see _move).
+		:return list: the path actually travelled.
+		"""
+		lvl = self.level
+		if not lvl: return path
+		size,modulo = self.rect.size,config.XWIN-self.rect.width
+		start,travelled = self.__lastpos,[]
+		while path:
+			x,y = start
+			# only platforms at the path's height can collide
+			ys = [y]+[frame[1] for frame in path]
+			area = Rect(0,min(ys),config.XWIN,max(ys)-min(ys)+size[1])
+			targets = [(target,plt) for plt in lvl.platforms_near(area)
+				for target in (plt.bonus,plt) if target]
+			if not targets: break
+			hit = None
+			for frame,(nx,ny,_,vy) in enumerate(path,1):
+				if vy > .5:# falling
+					first = inf
+					dx = (nx-x+modulo//2)%modulo-modulo//2# (across the wrap)
+					for target,plt in targets:
+						rect = target.rect
+						if ny+size[1] <= rect.top or y >= rect.bottom: continue
+						t = sweep(x,y,dx,ny-y,size,rect,modulo)
+						if t is not None and t < first:
+							first,hit,platform = t,target,plt
+					if hit: break
+				x,y = nx,ny
+			if not hit: break
+			# back to that frame
+			self.rect.topleft = (nx,ny)
+			self._velocity.x = path[frame-1][2]
+			if hit is platform:
+				self.onCollide(platform)
+				platform.onCollide()
+			else:
+				self.onCollide(hit)
+				self.jump(hit.force)
+			travelled += path[:frame]
+			# rest of the move from the bounce (may hit again)
+			start,path = self.rect.topleft,self._move(len(path)-frame)
+		return travelled+path
+
+
+	def _move(self, frames:int) -> list:
+		""" Velocity and position updates of given frames, each one done
+		like a single frame update (velocity clamped and position rounded
+		every frame).
+		Should be called in Player.update().
+		:return list: (x, y, velocity x, velocity y) after each frame.
+		"""
+		velocity,rect = self._velocity,self.rect
+		modulo = config.XWIN-rect.width
+		path = []
+		for _ in range(frames):
+			#Velocity update (apply gravity, input acceleration)
+			velocity.y += self.gravity
+			if self._input: # accelerate
+				velocity.x += self._input*self.accel
+			elif velocity.x: # deccelerate (down to 0)
+				sign = getsign(velocity.x)
+				velocity.x -= sign*self.deccel
+				velocity.x = round(velocity.x)
+				if getsign(velocity.x) != sign: velocity.x = 0
+			self._fix_velocity()
+			#Position Update (prevent x-axis to be out of screen)
+			rect.x = (rect.x+velocity.x)%modulo
+			rect.y += velocity.y
+			path.append((rect.x,rect.y,velocity.x,velocity.y))
+		return path
+
+
+	def update(self, dt:int=1) -> None:
 		""" For position and velocity updates.
 		Should be called each frame.
+		:param dt int: simulated time in whole frames (config.TIMESTEP):
+			coarser steps move like as many frames would, with swept
+			collisions (still one physics iteration per frame: they only
+			save collision, level and camera updates).
 		"""
+		assert dt >= 1 and dt == int(dt), "Timestep must be a whole number of frames !"
 		#Check if player out of screen: should be dead
-		if self.camera_rect.y>config.YWIN*2:
+		camera_y = self.__camera.state.y if self.__camera else 0
+		if self.rect.y-camera_y>config.YWIN*2:
 			self.dead = True
 			return
-		#Velocity update (apply gravity, input acceleration)
-		self._velocity.y += self.gravity
-		if self._input: # accelerate
-			self._velocity.x += self._input*self.accel
-		elif self._velocity.x: # deccelerate
-			self._velocity.x -= getsign(self._velocity.x)*self.deccel
-			self._velocity.x = round(self._velocity.x)
-		self._fix_velocity()
-
-		#Position Update (prevent x-axis to be out of screen)
-		self.rect.x = (self.rect.x+self._velocity.x)%(config.XWIN-self.rect.width)
-		self.rect.y += self._velocity.y
-
-		self.collisions()
\ No newline at end of file
+		self.__lastpos = self.rect.topleft
+		path = self._move(int(dt))
+
+		PROFILER.begin("collisions")
+		if self.swept or dt != 1:
+			path = self.swept_collisions(path)
+		else:
+			self.collisions()
+		PROFILER.end("collisions")
+
+		# highest y reached during the move
+		self.peak = min(self.rect.y,min(frame[1] for frame in path))
+
+
+	# ( Overriding inheritance: Sprite.camera_rect )
+	@property
+	def camera_rect(self) -> Rect:
+		" Position of the last draw (interpolated), else like Sprite's."
+		if self.__drawnrect is not None:
+			return self.__drawnrect
+		return Sprite.camera_rect.fget(self)
+
+
+	def blit_item(self, alpha:float=1., track:bool=True) -> tuple:
+		""" (image, render rect) at a position between last and current update.
+		:param alpha float: 0 (last update) to 1 (current position).
+		:param track bool: remember it as the last draw (camera_rect),
+			False for offscreen renders (ex: observation.Observer).
+		"""
+		if alpha >= 1 or self.dead:
+			rect = self.rect.copy()
+		else:
+			(x0,y0),(x1,y1) = self.__lastpos,self.rect.topleft
+			# do not interpolate across the x-axis screen wrap
+			x = x1 if abs(x1-x0) > config.HALF_XWIN else round(x0+(x1-x0)*alpha)
+			rect = Rect(x, round(y0+(y1-y0)*alpha), *self.rect.size)
+		if self.__camera:
+			rect = self.__camera.apply_rect(rect)
+		if track: self.__drawnrect = rect
+		return self._image,rect
+
+
+	# ( Overriding inheritance: Sprite.draw() )
+	def draw(self, surface:Surface, alpha:float=1.) -> None:
+		""" Like Sprite.draw(), at a position between last and current update.
+		:param surface pygame.Surface: the surface to draw on.
+		:param alpha float: 0 (last update) to 1 (current position).
+		"""
+		surface.blit(*self.blit_item(alpha))
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+	CopyLeft 2021 Michael Rouves
+
+	This file is part of Pygame-DoodleJump.
+	Pygame-DoodleJump is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+
+	Pygame-DoodleJump is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+	GNU Affero General Public License for more details.
+
+	You should have received a copy of the GNU Affero General Public License
+	along with Pygame-DoodleJump. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+from array import array
+from time import perf_counter
+import json, csv
+
+from pygame import Surface, Rect
+import pygame
+
+import settings as config
+
+
+# Game.run phases, then sub-phases (included in their parent phase)
+PHASES = ("events","update","render","generation","collisions","capture")
+
+
+
+class Profiler:
+	"""
+	A class to represent a frame profiler.
+
+	Durations of each phase are accumulated per frame in fixed-size ring
+	buffers (config.PROFILER_FRAMES last frames).
+	When disabled begin/end return immediately.
+	"""
+
+	def __init__(self, size:int=config.PROFILER_FRAMES, phases=PHASES):
+		self.enabled = False
+		self.overlay = False
+		self.size = size
+		self.phases = phases
+		# one more slot than frames kept: the frame in progress
+		self._slots = size+1
+		self._buffers = {p:array("d",bytes(8*self._slots))
+			for p in ("frame",)+phases}
+		self._starts = dict.fromkeys(phases,0.)
+		self._index = 0# current frame slot
+		self._frames = 0# frames recorded (saturates at size)
+		self._frame_start = None
+		self._overlay_text = []
+
+	def enable(self, enabled:bool=True) -> None:
+		self.enabled = enabled
+		self._frame_start = None
+		if not enabled: self.overlay = False
+
+	def toggle_overlay(self) -> None:
+		" Shows/hides the overlay (enables profiling if needed)."
+		self.overlay = not self.overlay
+		if self.overlay and not self.enabled:
+			self.enable()
+
+	def begin(self, phase:str) -> None:
+		" Starts timing a phase."
+		if self.enabled:
+			self._starts[phase] = perf_counter()
+
+	def end(self, phase:str) -> None:
+		" Stops timing a phase (durations add up until next frame)."
+		if self.enabled:
+			self._buffers[phase][self._index] += perf_counter()-self._starts[phase]
+
+	def next_frame(self) -> None:
+		" Closes current frame, should be called once per frame."
+		if not self.enabled: return
+		now = perf_counter()
+		if self._frame_start is not None:
+			self._buffers["frame"][self._index] = now-self._frame_start
+			self._index = (self._index+1)%self._slots
+			self._frames = min(self._frames+1,self.size)
+			for buffer in self._buffers.values():
+				buffer[self._index] = 0.
+		self._frame_start = now
+
+	def frames(self) -> list:
+		""" Recorded frames, oldest first.
+		:return list: dicts of durations (s) per phase, "frame" is the total.
+		"""
+		start = (self._index-self._frames)%self._slots
+		slots = [(start+i)%self._slots for i in range(self._frames)]
+		return [{p:b[i] for p,b in self._buffers.items()} for i in slots]
+
+	def means(self) -> dict:
+		" Mean duration (s) of each phase over recorded frames."
+		frames = self.frames()
+		if not frames: return dict.fromkeys(self._buffers,0.)
+		return {p:sum(f[p] for f in frames)/len(frames) for p in self._buffers}
+
+	def dump(self, path:str) -> None:
+		""" Saves recorded frames (durations in ms).
+		:param path str: .json file, else CSV.
+		"""
+		fields = ("frame",)+self.phases
+		rows = [[f[p]*1e3 for p in fields] for f in self.frames()]
+		with open(path,"w",newline="") as file:
+			if path.endswith(".json"):
+				json.dump({"unit":"ms","phases":fields,"frames":rows,
+					"mean":{p:m*1e3 for p,m in self.means().items()}},file)
+			else:
+				writer = csv.writer(file)
+				writer.writerow(fields)
+				writer.writerows(rows)
+
+	def overlay_rect(self) -> Rect:
+		" Screen area covered by the overlay (bottom of the screen)."
+		height = config.PROFILER_GRAPH_HEIGHT+20*(len(self.phases)+1)+10
+		return Rect(0,config.YWIN-height,config.XWIN,height)
+
+	def draw(self, surface:Surface) -> None:
+		""" Draws frame-time graph and per-phase breakdown (if overlay shown).
+		:param surface pygame.Surface: the surface to draw on.
+		"""
+		if not self.overlay: return
+		area = self.overlay_rect()
+		surface.fill(config.WHITE,area)
+		# graph: one bar per frame, budget (1/FPS) at half height
+		height = config.PROFILER_GRAPH_HEIGHT
+		base,scale = area.bottom,height/2/config.TIMESTEP
+		frames = self.frames()
+		width = area.width/self.size
+		for i,frame in enumerate(frames):
+			bar = min(frame["frame"]*scale,height)
+			color = config.FOREST_GREEN if bar <= height/2 else config.BLACK
+			pygame.draw.rect(surface,color,(i*width,base-bar,max(width,1),bar))
+		pygame.draw.line(surface,config.GRAY,(0,base-height/2),(area.w,base-height/2))
+		# breakdown text (re-rendered a few times per second only)
+		if not self._index%15 or not self._overlay_text:
+			means = self.means()
+			lines = [f"frame {means['frame']*1e3:6.2f} ms"]+[
+				f"{p:>10} {means[p]*1e3:6.2f} ms" for p in self.phases]
+			self._overlay_text = [config.SMALL_FONT.render(l,1,config.GRAY)
+				for l in lines]
+		for i,text in enumerate(self._overlay_text):
+			surface.blit(text,(10,area.y+5+i*20))
+
+
+
+# Shared by the whole game
+PROFILER = Profiler()
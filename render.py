@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+	CopyLeft 2021 Michael Rouves
+
+	This file is part of Pygame-DoodleJump.
+	Pygame-DoodleJump is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+
+	Pygame-DoodleJump is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+	GNU Affero General Public License for more details.
+
+	You should have received a copy of the GNU Affero General Public License
+	along with Pygame-DoodleJump. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+from pygame import Surface
+import pygame
+
+import settings as config
+
+
+
+class DirtyRenderer:
+	"""
+	A class to represent a dirty-rectangle renderer.
+
+	Between begin() and end() the scene is drawn as usual, but only the
+	areas covered last frame are erased and only the areas covered last
+	frame or this frame are pushed to the display.
+	Falls back to a full redraw when the camera scrolled (every sprite moved)
+	or when dirty areas cover too much of the screen.
+	"""
+
+	def __init__(self, surface:Surface, background:tuple=config.WHITE,
+			max_area:float=config.DIRTY_RECTS_MAX_AREA):
+		self.surface = surface
+		self.background = background
+		self.max_area = max_area*surface.get_width()*surface.get_height()
+		self._last_rects = []
+		self._scroll = None
+		self._full = True
+		# stats
+		self.full_frames = 0
+		self.dirty_frames = 0
+		self.updated_area = 0# pixels pushed to the display
+
+	def invalidate(self) -> None:
+		" Forces a full redraw on next frame."
+		self._full = True
+
+	def begin(self, scroll:int) -> None:
+		""" Erases previous frame, should be called before drawing.
+		:param scroll int: current camera position (Camera.state.y).
+		"""
+		if scroll != self._scroll:
+			self._scroll = scroll
+			self._full = True
+		if self._full:
+			self.surface.fill(self.background)
+		else:
+			for rect in self._last_rects:
+				self.surface.fill(self.background, rect)
+
+	def end(self, rects:list) -> None:
+		""" Updates the display, should be called after drawing.
+		:param rects list: screen rects drawn this frame.
+		"""
+		screen = self.surface.get_rect()
+		rects = [r.clip(screen) for r in rects]
+		dirty = self._last_rects + rects
+		self._last_rects = rects
+		if not self._full and sum(r.w*r.h for r in dirty) > self.max_area:
+			self._full = True
+		if self._full:
+			pygame.display.update()
+			self.full_frames += 1
+			self.updated_area += screen.w*screen.h
+		else:
+			pygame.display.update(dirty)
+			self.dirty_frames += 1
+			self.updated_area += sum(r.w*r.h for r in dirty)
+		self._full = False
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+	CopyLeft 2021 Michael Rouves
+
+	This file is part of Pygame-DoodleJump.
+	Pygame-DoodleJump is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+
+	Pygame-DoodleJump is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+	GNU Affero General Public License for more details.
+
+	You should have received a copy of the GNU Affero General Public License
+	along with Pygame-DoodleJump. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+from collections import namedtuple
+import struct
+
+from pygame.locals import KEYDOWN,KEYUP,K_LEFT,K_RIGHT,K_RETURN
+from pygame.event import Event
+import pygame
+
+import settings as config
+
+
+# Recording format (little endian):
+#	header: magic "DJRP", version (u8), level seed (u64)
+#	events: step delta (LEB128 varint), code (u8): key index | 0x80 if KEYUP
+#	end:    step delta (varint), END code, score (i32), death step (i32)
+MAGIC = b"DJRP"
+VERSION = 1
+HEADER = struct.Struct("<4sBQ")
+FOOTER = struct.Struct("<ii")
+KEYS = (K_LEFT,K_RIGHT,K_RETURN)
+KEYUP_FLAG = 0x80
+END = 0x7F
+
+
+
+class ReplayResult(namedtuple("ReplayResult",
+		"score death_step expected_score expected_death_step")):
+	" Outcome of a replay: ok if it matches the recording."
+	@property
+	def ok(self) -> bool:
+		return (self.score,self.death_step) == (
+			self.expected_score,self.expected_death_step)
+
+
+
+def _write_varint(out:bytearray, value:int) -> None:
+	while value >= 0x80:
+		out.append(value&0x7F|0x80)
+		value >>= 7
+	out.append(value)
+
+def _read_varint(data:bytes, pos:int) -> tuple:
+	value = shift = 0
+	while True:
+		byte = data[pos]
+		pos += 1
+		value |= (byte&0x7F)<<shift
+		if byte < 0x80: return value,pos
+		shift += 7
+
+
+
+class Recorder:
+	"""
+	A class to represent an input recorder.
+
+	Logs the level seed and the key events fed to Player.handle_event,
+	stamped with the simulation step they were applied before.
+	"""
+
+	def __init__(self, seed:int):
+		self.seed = seed
+		self.__data = bytearray(HEADER.pack(MAGIC,VERSION,seed))
+		self.__step = 0
+		self.__closed = False
+
+	def record(self, step:int, event:Event) -> None:
+		""" Logs an input event (ignored if not a game input).
+		:param step int: number of updates done before the event.
+		:param event pygame.Event: the event.
+		"""
+		if event.type not in (KEYDOWN,KEYUP) or event.key not in KEYS:
+			return
+		assert not self.__closed, "Recording already finished !"
+		_write_varint(self.__data, step-self.__step)
+		self.__step = step
+		code = KEYS.index(event.key)
+		if event.type == KEYUP: code |= KEYUP_FLAG
+		self.__data.append(code)
+
+	def finish(self, step:int, score:int, death_step:int) -> bytes:
+		""" Ends the recording with the expected outcome.
+		:param step int: number of updates done.
+		:param score int: final score.
+		:param death_step int: step of last player death (-1 if none).
+		:return bytes: the recording.
+		"""
+		if not self.__closed:
+			_write_varint(self.__data, step-self.__step)
+			self.__step = step
+			self.__data.append(END)
+			self.__data += FOOTER.pack(score,death_step)
+			self.__closed = True
+		return bytes(self.__data)
+
+	def save(self, path:str) -> None:
+		with open(path,"wb") as file:
+			file.write(bytes(self.__data))
+
+
+
+class Recording:
+	"""
+	A class to represent a parsed recording.
+
+	events is a list of (step, pygame.Event), steps is the recording length.
+	"""
+
+	def __init__(self, data:bytes):
+		magic,version,self.seed = HEADER.unpack_from(data)
+		assert magic == MAGIC, "Not a DoodleJump recording !"
+		assert version == VERSION, "Unsupported recording version !"
+		self.events = []
+		pos,step = HEADER.size,0
+		while True:
+			delta,pos = _read_varint(data,pos)
+			step += delta
+			code = data[pos]
+			pos += 1
+			if code == END: break
+			type_ = KEYUP if code&KEYUP_FLAG else KEYDOWN
+			self.events.append((step,Event(type_,key=KEYS[code&~KEYUP_FLAG])))
+		self.steps = step
+		self.score,self.death_step = FOOTER.unpack_from(data,pos)
+
+	@classmethod
+	def load(cls, path:str) -> "Recording":
+		with open(path,"rb") as file:
+			return cls(file.read())
+
+
+
+def replay(recording:Recording, realtime:bool=False,
+		event_driven:bool=False) -> ReplayResult:
+	""" Plays a recording and checks its outcome.
+	:param recording Recording: the recording to play.
+	:param realtime bool: render at game speed, else run as fast as possible
+		without rendering.
+	:param event_driven bool: jump from one recorded event to the next
+		(World.advance), same outcome with far fewer updates.
+	:return ReplayResult: reached and expected score/death step.
+	"""
+	assert not (realtime and event_driven), "Event-driven replays are not rendered !"
+	from main import Game# (main imports this module)
+	game = Game(seed=recording.seed,headless=not realtime)
+	events = iter(recording.events)
+	pending = next(events,None)
+	while game.steps < recording.steps:
+		while pending and pending[0] == game.steps:
+			game.handle_event(pending[1])
+			pending = next(events,None)
+		if event_driven:
+			until = pending[0] if pending else recording.steps
+			game.world.advance(max(min(until,recording.steps)-game.steps,1))
+			continue
+		game._update_loop()
+		if realtime:
+			pygame.event.pump()
+			game._render_loop()
+			game.clock.tick(config.FPS)
+	return ReplayResult(game.score,game.death_step,
+		recording.score,recording.death_step)
+
+
+
+
+if __name__ == "__main__":
+	from argparse import ArgumentParser
+	parser = ArgumentParser(description="Replays a DoodleJump recording")
+	parser.add_argument("path")
+	parser.add_argument("--realtime",action="store_true",
+		help="render at game speed (default: as fast as possible, headless)")
+	parser.add_argument("--event-driven",action="store_true",
+		help="skip the frames between recorded events (World.advance)")
+	args = parser.parse_args()
+	result = replay(Recording.load(args.path),args.realtime,args.event_driven)
+	print(f"score {result.score} (expected {result.expected_score}), "
+		f"death step {result.death_step} (expected {result.expected_death_step})")
+	raise SystemExit(0 if result.ok else 1)
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+	CopyLeft 2021 Michael Rouves
+
+	This file is part of Pygame-DoodleJump.
+	Pygame-DoodleJump is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+
+	Pygame-DoodleJump is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+	GNU Affero General Public License for more details.
+
+	You should have received a copy of the GNU Affero General Public License
+	along with Pygame-DoodleJump. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+from functools import lru_cache
+import json, os
+
+import pygame.font
+
+
+# name -> font file path ("" if not installed), saved between runs so
+# pygame.font.match_font (which scans system font directories) runs once
+FONT_CACHE_PATH = os.path.join(
+	os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+	"pygame-doodlejump","fonts.json")
+_font_paths = None
+
+
+
+def _load_font_paths() -> dict:
+	global _font_paths
+	if _font_paths is None:
+		try:
+			with open(FONT_CACHE_PATH) as file:
+				_font_paths = json.load(file)
+		except (OSError,ValueError):
+			_font_paths = {}
+	return _font_paths
+
+
+def _save_font_paths() -> None:
+	try:
+		os.makedirs(os.path.dirname(FONT_CACHE_PATH),exist_ok=True)
+		with open(FONT_CACHE_PATH,"w") as file:
+			json.dump(_font_paths,file)
+	except OSError:
+		pass# read-only home: only costs a scan next time
+
+
+def font_path(name:str) -> str:
+	""" Resolves a system font name to its file (like SysFont does).
+	:param name str: font name ("" or None: pygame default font).
+	:return str: font file path, None for the default font.
+	"""
+	if not name: return None
+	paths = _load_font_paths()
+	path = paths.get(name)
+	if path is None or (path and not os.path.exists(path)):
+		path = paths[name] = pygame.font.match_font(name) or ""
+		_save_font_paths()
+	return path or None
+
+
+@lru_cache(maxsize=None)
+def get_font(name:str, size:int) -> pygame.font.Font:
+	""" Returns a font, initializing pygame.font on first use.
+	:param name str: system font name ("" for pygame default font).
+	:param size int: font size.
+	"""
+	if not pygame.font.get_init():
+		pygame.font.init()
+	return pygame.font.Font(font_path(name),size)
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""
+	CopyLeft 2021 Michael Rouves
+
+	This file is part of Pygame-DoodleJump.
+	Pygame-DoodleJump is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+
+	Pygame-DoodleJump is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+	GNU Affero General Public License for more details.
+
+	You should have received a copy of the GNU Affero General Public License
+	along with Pygame-DoodleJump. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+from collections import deque
+from time import perf_counter
+import asyncio, struct
+
+from pygame.locals import KEYDOWN,KEYUP,K_RETURN
+from pygame.event import Event
+
+from replay import KEYS, KEYUP_FLAG
+from world import World
+import settings as config
+
+
+# Protocol (little endian), one game session per connection:
+#	client	HELLO	"H", level seed (i64, -1: random)
+#			INPUT	"I", sequence (u32), key code (u8): like replay.py,
+#					index in replay.KEYS | 0x80 if KEYUP
+#			ACK		"A", tick (u32): state of that tick was received
+#	server	TICK	"T", tick (u32), base tick (u32), last applied input
+#					sequence (u32), player x, y (i32), velocity x, y (f32),
+#					score (i32), dead (u8), added and removed platform
+#					counts (u16)
+#					then added platforms: x, y (i32), flags (u8)
+#					then removed platforms: y (i32)
+# Platforms are identified by their y (unique in a level). Deltas are
+# relative to the platforms of the base tick (the last acked one, 0: no
+# platform), so a lost or skipped tick is repaired by the next one: see
+# ClientView.
+HELLO = struct.Struct("<cq")
+INPUT = struct.Struct("<cIB")
+ACK = struct.Struct("<cI")
+TICK = struct.Struct("<cIIIiiffiBHH")
+ADDED = struct.Struct("<iiB")
+REMOVED = struct.Struct("<i")
+BREAKABLE,BONUS = 1,2# platform flags
+HISTORY = 2*config.SERVER_TICK_RATE# unacked ticks kept per session
+
+
+
+class Session:
+	"""
+	A class to represent one game hosted by the server.
+
+	Inputs are queued and applied before the next tick (like events before
+	an update), each tick produces a delta against the last acked state.
+	"""
+
+	def __init__(self, seed:int, writer:asyncio.StreamWriter):
+		self.world = World(None if seed < 0 else seed)
+		self.writer = writer
+		self.tick = 0
+		self.input_seq = 0# last applied
+		self.__inputs = deque()# (sequence, event)
+		self.__history = deque(maxlen=HISTORY)# (tick, platforms) not acked
+		self.__acked = {}# platforms known by the client: y -> record
+		self.__acked_tick = 0# (base of the next deltas)
+		self.__platforms,self.__version = {},None# (rebuilt on level change)
+
+	def push_input(self, sequence:int, code:int) -> None:
+		""" Queues a key event for the next tick.
+		:param code int: replay.py key code (unknown codes are ignored).
+		"""
+		index = code&~KEYUP_FLAG
+		if index >= len(KEYS): return
+		type_ = KEYUP if code&KEYUP_FLAG else KEYDOWN
+		self.__inputs.append((sequence,Event(type_,key=KEYS[index])))
+
+	def ack(self, tick:int) -> None:
+		" The client received given tick: later deltas start from it."
+		history = self.__history
+		while history and history[0][0] < tick:
+			history.popleft()
+		if history and history[0][0] == tick:
+			self.__acked_tick,self.__acked = history.popleft()
+
+	def step(self) -> None:
+		" Applies queued inputs then advances the world by one tick."
+		world = self.world
+		while self.__inputs:
+			self.input_seq,event = self.__inputs.popleft()
+			if event.type == KEYDOWN and event.key == K_RETURN:
+				if world.player.dead: world.reset()
+			else:
+				world.handle_event(event)
+		world.update()
+		self.tick += 1
+
+	def delta(self) -> bytes:
+		" Current tick's state, platforms relative to the last ack."
+		ring = self.world.lvl.platforms
+		if ring.version != self.__version:
+			self.__version,self.__platforms = ring.version,{}
+			for plt in ring:
+				x,y = plt.rect.topleft
+				self.__platforms[y] = (x,y,
+					plt.breakable*BREAKABLE|bool(plt.bonus)*BONUS)
+		platforms,acked = self.__platforms,self.__acked
+		self.__history.append((self.tick,platforms))
+		if platforms is acked:
+			added = removed = ()
+		else:
+			added = [r for y,r in platforms.items() if acked.get(y) != r]
+			removed = [y for y in acked if y not in platforms]
+		player = self.world.player
+		data = [TICK.pack(b"T",self.tick,self.__acked_tick,self.input_seq,
+			*player.rect.topleft,*player._velocity,self.world.score,
+			player.dead,len(added),len(removed))]
+		data.extend(ADDED.pack(*r) for r in added)
+		data.extend(REMOVED.pack(y) for y in removed)
+		return b"".join(data)
+
+	def send(self) -> bool:
+		""" Sends current tick's delta, unless the client is not reading.
+		:return bool: False if skipped (the next delta repairs it).
+		"""
+		transport = self.writer.transport
+		if transport.is_closing(): return False
+		if transport.get_write_buffer_size() > config.SERVER_MAX_BUFFER:
+			return False
+		self.writer.write(self.delta())
+		return True
+
+	def close(self) -> None:
+		self.world.close()
+		self.writer.close()
+
+
+
+class ClientView:
+	"""
+	A class to represent a client's copy of the platforms.
+
+	The platforms of every received tick are kept until a later delta uses
+	a newer base: each delta applies to the platforms of its base tick (not
+	to the last ones received, which may include ticks the server does
+	not know were received).
+	"""
+
+	def __init__(self):
+		self.platforms = {}# y -> (x, y, flags)
+		self.__states = {0:self.platforms}# tick -> platforms
+
+	def apply(self, tick:int, base:int, added, removed) -> dict:
+		""" Platforms of tick, from its delta.
+		:param added iter: (x, y, flags) of added platforms.
+		:param removed iter: y of removed platforms.
+		"""
+		platforms = dict(self.__states[base])
+		for y in removed:
+			platforms.pop(y,None)
+		for record in added:
+			platforms[record[1]] = record
+		# later deltas never use an older base
+		self.__states = {t:p for t,p in self.__states.items() if t >= base}
+		self.__states[tick] = self.platforms = platforms
+		return platforms
+
+
+
+class SessionServer:
+	"""
+	A class to represent a game server.
+
+	Every session is stepped by a single ticker task at a fixed tick rate,
+	on one event loop (no thread per session). Connections only read
+	inputs and acks.
+	"""
+
+	def __init__(self, tick_rate:int=config.SERVER_TICK_RATE):
+		self.period = 1/tick_rate
+		self.sessions = set()
+		self.ticks = 0
+		self.overruns = 0# ticks that ended after the next one was due
+		self.tick_durations = deque(maxlen=10*tick_rate)# (s)
+
+	async def handle(self, reader:asyncio.StreamReader,
+			writer:asyncio.StreamWriter) -> None:
+		" One connection: HELLO then inputs and acks until closed."
+		session = None
+		try:
+			_,seed = HELLO.unpack(await reader.readexactly(HELLO.size))
+			session = Session(seed,writer)
+			self.sessions.add(session)
+			while True:
+				kind = await reader.readexactly(1)
+				if kind == b"I":
+					_,sequence,code = INPUT.unpack(
+						kind+await reader.readexactly(INPUT.size-1))
+					session.push_input(sequence,code)
+				elif kind == b"A":
+					_,tick = ACK.unpack(kind+await reader.readexactly(ACK.size-1))
+					session.ack(tick)
+				else:
+					break# protocol error
+		except (asyncio.IncompleteReadError,ConnectionError):
+			pass
+		finally:
+			if session:
+				self.sessions.discard(session)
+				session.close()
+			else:
+				writer.close()
+
+	async def ticker(self) -> None:
+		" Steps every session at the tick rate (absolute schedule)."
+		loop = asyncio.get_running_loop()
+		next_tick = loop.time()
+		while True:
+			start = perf_counter()
+			for session in tuple(self.sessions):
+				session.step()
+				session.send()
+			self.ticks += 1
+			self.tick_durations.append(perf_counter()-start)
+			next_tick += self.period
+			delay = next_tick-loop.time()
+			if delay < 0:# too slow: drop the missed ticks
+				self.overruns += 1
+				next_tick,delay = loop.time(),0
+			await asyncio.sleep(delay)
+
+	async def report(self, every:float) -> None:
+		" Prints load statistics periodically."
+		while True:
+			await asyncio.sleep(every)
+			durations = sorted(self.tick_durations) or [0.]
+			print(f"{len(self.sessions)} sessions, {self.ticks} ticks, "
+				f"{self.overruns} overruns, tick p50 "
+				f"{durations[len(durations)//2]*1e3:.2f} ms p99 "
+				f"{durations[int(len(durations)*.99)]*1e3:.2f} ms",flush=True)
+
+	async def serve(self, host:str=config.SERVER_HOST,
+			port:int=config.SERVER_PORT, path:str=None,
+			report:float=0) -> None:
+		""" Serves forever.
+		:param path str: Unix socket path (default: TCP host:port).
+		:param report float: print statistics every N seconds (0: never).
+		"""
+		if path:
+			server = await asyncio.start_unix_server(self.handle,path)
+		else:
+			server = await asyncio.start_server(self.handle,host,port)
+		tasks = [asyncio.create_task(self.ticker())]
+		if report:
+			tasks.append(asyncio.create_task(self.report(report)))
+		async with server:
+			try:
+				await server.serve_forever()
+			finally:
+				for task in tasks: task.cancel()
+
+
+
+
+if __name__ == "__main__":
+	from argparse import ArgumentParser
+	parser = ArgumentParser(description="Headless DoodleJump session server")
+	parser.add_argument("--host",default=config.SERVER_HOST)
+	parser.add_argument("--port",type=int,default=config.SERVER_PORT)
+	parser.add_argument("--unix",metavar="PATH",help="serve on a Unix socket")
+	parser.add_argument("--tick-rate",type=int,default=config.SERVER_TICK_RATE)
+	parser.add_argument("--report",type=float,default=5,metavar="SECONDS",
+		help="print load statistics periodically (0: never)")
+	args = parser.parse_args()
+	try:
+		asyncio.run(SessionServer(args.tick_rate).serve(
+			args.host,args.port,args.unix,args.report))
+	except KeyboardInterrupt:
+		pass
@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
-from pygame.font import SysFont
-from pygame import init
-init()
+# Plain data only: pygame modules are initialized where first needed
+# (display by Game, fonts by resources.get_font)
 # ==================================
 
 #Window Settings
@@ -10,6 +9,18 @@ HALF_XWIN,HALF_YWIN = XWIN/2,YWIN/2 # Center
 DISPLAY = (XWIN,YWIN)
 FLAGS = 0 #                           Fullscreen, resizeable... 
 FPS = 60 #                            Render frame rate
+TIMESTEP = 1/FPS #                    Simulation step duration (s)
+MAX_STEPS_PER_FRAME = 5 #             Catch-up limit after a stall
+PACING = "tick" #                     Frame wait: tick (sleep), busy or hybrid
+PACING_SPIN = .002 #                  Hybrid pacing: spin this long (s)
+MAX_FRAME_SKIP = 4 #                  Renders skipped in a row when behind
+
+DIRTY_RECTS = False #                 Only redraw changed screen areas
+DIRTY_RECTS_MAX_AREA = .5 #           Full redraw above this screen ratio
+
+# Profiler (F3: overlay)
+PROFILER_FRAMES = 240 #               Frames kept in ring buffers
+PROFILER_GRAPH_HEIGHT = 100
 
 # Colors
 BLACK = (0,0,0)
@@ -25,7 +36,33 @@ PLAYER_COLOR = ANDROID_GREEN
 PLAYER_MAX_SPEED = 20
 PLAYER_JUMPFORCE = 20
 PLAYER_BONUS_JUMPFORCE = 70
+PLAYER_START_SPEED = 1.5 #            X speed given on key press
+PLAYER_ACCEL = .5
+PLAYER_DECCEL = .6
+PLAYER_MAX_FALL_SPEED = 100
 GRAVITY = .98
+SWEPT_COLLISIONS = False #            Continuous collisions (no tunneling)
+
+# Camera
+CAMERA_LERP = 5
+
+# Headless tournaments (tournament.py)
+TOURNAMENT_MAX_FRAMES = 5000 #        Frame cap per episode
+
+# Frame capture (capture.py)
+CAPTURE_FORMAT = "zlib" #             png (one file per frame), raw or zlib stream
+CAPTURE_POOL = 8 #                    Preallocated frame buffers
+CAPTURE_POLICY = "drop" #             When no buffer is free: drop or block
+
+# Session server (server.py)
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 5757
+SERVER_TICK_RATE = FPS #              Ticks per second of every session
+SERVER_MAX_BUFFER = 1<<16 #           Unsent bytes before deltas are skipped
+
+# Observations for learning agents (observation.py)
+OBSERVATION_PLATFORMS = 8 #           Nearest platforms in feature arrays
+OBSERVATION_BONUSES = 2 #             Nearest bonuses in feature arrays
 
 # Platforms
 PLATFORM_COLOR = FOREST_GREEN
@@ -35,7 +72,20 @@ PLATFORM_DISTANCE_GAP = (50,210)
 MAX_PLATFORM_NUMBER = 10
 BONUS_SPAWN_CHANCE = 10
 BREAKABLE_PLATFORM_CHANCE = 12
+LEVEL_STREAMING = False #             Generate layouts in a background thread
+STREAM_CHUNK_SIZE = 32 #              Platforms per generated chunk
+STREAM_QUEUE_CHUNKS = 8 #             Chunks generated ahead
+STREAM_SPAWN_BUDGET = 16 #            Max platforms spawned per frame
+
+# Fonts (name, size): loaded on first access of LARGE_FONT / SMALL_FONT
+FONTS = {
+	"LARGE_FONT": ("",128),
+	"SMALL_FONT": ("arial",24),
+}
 
-# Fonts
-LARGE_FONT = SysFont("",128)
-SMALL_FONT = SysFont("arial",24)
\ No newline at end of file
+def __getattr__(name:str):
+	" Lazy module attributes: fonts are resolved and loaded on demand."
+	if name in FONTS:
+		from resources import get_font
+		return get_font(*FONTS[name])
+	raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
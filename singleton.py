@@ -26,6 +26,8 @@ class Singleton:
 		Stores the instance in a static variable: Class.instance
 		(Check Singleton design pattern for more info)
 	"""
+	__slots__ = ()# (no __dict__ added to slotted subclasses)
+
 	def __new__(cls,*args,**kwargs):
 		if not hasattr(cls, 'instance'):
 			cls.instance = super(Singleton, cls).__new__(cls)
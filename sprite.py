@@ -19,7 +19,67 @@
 
 
 from pygame import Surface,Rect
-from camera import Camera
+import pygame
+
+
+
+class SurfaceCache:
+	"""
+	A class to represent a flyweight cache of plain colored surfaces.
+
+	Sprites of the same size and color share one surface (converted to the
+	display pixel format when a display exists).
+	Surfaces are reference counted and dropped when no sprite uses them.
+	"""
+
+	def __init__(self):
+		self.__surfaces = {}# key -> surface
+		self.__refs = {}# id(surface) -> [key, refcount]
+
+	def __len__(self) -> int:
+		return len(self.__surfaces)
+
+	@property
+	def nbytes(self) -> int:
+		" Pixel memory of cached surfaces."
+		return sum(s.get_bytesize()*s.get_width()*s.get_height()
+			for s in self.__surfaces.values())
+
+	@staticmethod
+	def _pixel_format() -> tuple:
+		display = pygame.display.get_surface() if pygame.display.get_init() else None
+		if not display: return None
+		return display.get_bitsize(),display.get_masks()
+
+	def acquire(self, size:tuple, color:tuple) -> Surface:
+		""" Returns the shared surface of given size and color.
+		Must be released once not used anymore.
+		"""
+		fmt = self._pixel_format()
+		key = (tuple(size),tuple(color),fmt)
+		surface = self.__surfaces.get(key)
+		if surface is None:
+			surface = Surface(size)
+			surface.fill(color)
+			if fmt: surface = surface.convert()
+			self.__surfaces[key] = surface
+			self.__refs[id(surface)] = [key,0]
+		self.__refs[id(surface)][1] += 1
+		return surface
+
+	def release(self, surface:Surface) -> None:
+		" Drops a reference to a surface returned by acquire()."
+		ref = self.__refs.get(id(surface))
+		if not ref: return
+		ref[1] -= 1
+		if ref[1] <= 0:
+			del self.__refs[id(surface)]
+			del self.__surfaces[ref[0]]
+
+
+
+# Shared by every sprite
+SURFACES = SurfaceCache()
 
 
 
@@ -28,41 +88,61 @@ class Sprite:
 	A class to represent a sprite.
 	
 	Used for pygame displaying.
-	Image generated with given color and size.
+	Image is a surface of given color and size, shared between sprites
+	that look alike (see SurfaceCache).
+	Slotted (no __dict__): subclasses must declare their own __slots__.
 	"""
+	__slots__ = ("rect","_image","__color")
+
 	# default constructor (must be called if overrided by inheritance)
 	def __init__(self,x:int,y:int,w:int,h:int,color:tuple):
 		self.__color = color
-		self._image = Surface((w,h))
-		self._image.fill(self.color)
-		self._image = self._image.convert()
+		self._image = SURFACES.acquire((w,h),color)
 		self.rect = Rect(x,y,w,h)
-		self.camera_rect = self.rect.copy()
+
+	def __del__(self):
+		# module globals may already be gone at interpreter exit
+		if SURFACES is not None and getattr(self,"_image",None):
+			SURFACES.release(self._image)
 
 	# Public getters for _image & __color so they remain private
 	@property
 	def image(self) -> Surface:
+		" Shared surface: should not be modified."
 		return self._image
 	@property
 	def color(self) -> tuple:
 		return self.__color
+	@property
+	def camera(self):
+		" Camera the sprite is rendered through (None: screen position)."
+		return None
+	@property
+	def camera_rect(self) -> Rect:
+		" Render position (computed from the camera when needed)."
+		camera = self.camera
+		if camera:
+			return camera.apply(self)
+		return self.rect.copy()
 
 	@color.setter
 	def color(self, new:tuple) -> None:
 		" Called when Sprite.__setattr__('color',x)."
 		assert isinstance(new,tuple) and len(new)==3,"Value is not a color"
 		self.__color = new
-		#update image surface
-		self._image.fill(self.color)
+		#switch to the shared surface of this color
+		image = SURFACES.acquire(self._image.get_size(),new)
+		SURFACES.release(self._image)
+		self._image = image
 	
 
 	def draw(self, surface:Surface) -> None:
 		""" Render method,Should be called every frame after update.
 		:param surface pygame.Surface: the surface to draw on.
 		"""
-		# If camera instancied: calculate render positon
-		if Camera.instance:
-			self.camera_rect = Camera.instance.apply(self)
-			surface.blit(self._image,self.camera_rect)
+		# If rendered through a camera: calculate render positon
+		camera = self.camera
+		if camera:
+			surface.blit(self._image,camera.apply(self))
 		else:
 			surface.blit(self._image,self.rect)
\ No newline at end of file
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+	CopyLeft 2021 Michael Rouves
+
+	This file is part of Pygame-DoodleJump.
+	Pygame-DoodleJump is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+
+	Pygame-DoodleJump is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+	GNU Affero General Public License for more details.
+
+	You should have received a copy of the GNU Affero General Public License
+	along with Pygame-DoodleJump. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+from collections import namedtuple, deque
+from threading import Thread, Event, Lock
+from random import Random
+
+import settings as config
+
+
+
+# Layout of one platform (plain data: safe to hand over between threads)
+PlatformRecord = namedtuple("PlatformRecord","x y bonus breakable")
+
+
+def generate_chunk(rng:Random, last_y:int, count:int, distance_min:int,
+		distance_max:int, width:int, bonus_chance:int,
+		breakable_chance:int) -> list:
+	""" Generates platform layouts like Level.create_platform.
+	:param rng random.Random: the generator to draw from.
+	:param last_y int: y of the platform below the first generated one.
+	:param count int: number of platforms to generate.
+	:return list: PlatformRecord list, from bottom to top.
+	"""
+	randint = rng.randint
+	chunk = []
+	for _ in range(count):
+		last_y -= randint(distance_min,distance_max)
+		chunk.append(PlatformRecord(
+			randint(0,config.XWIN-width),# X POS
+			last_y,#                       Y POS
+			not randint(0,bonus_chance),#  HAS A Bonus
+			not randint(0,breakable_chance)))# IS BREAKABLE
+	return chunk
+
+
+
+class LevelStreamer:
+	"""
+	A class to represent a background level generator.
+
+	A worker thread generates chunks of PlatformRecord ahead of the camera
+	into a bounded buffer, the main thread pops records without ever
+	waiting for it (None if none is ready). When the worker is late (ex:
+	fast forward without frame pacing), generate() makes the next chunks on
+	the calling thread instead (see Level._generation).
+
+	Both threads draw from the same generator under a lock, each chunk
+	following the previous one: the sequence of layouts only depends on the
+	seed, not on timing (nor, unlike synchronous generation, on which
+	platforms were broken).
+	Every start() (level reset) begins a new sequence derived from the seed.
+	"""
+
+	def __init__(self, level, seed:int, chunk_size:int=config.STREAM_CHUNK_SIZE,
+			max_chunks:int=config.STREAM_QUEUE_CHUNKS):
+		# level parameters are copied: the worker never touches the level
+		self.params = (level.distance_min, level.distance_max,
+			level.platform_size[0], level.bonus_platform_chance,
+			level.breakable_platform_chance)
+		self.seed = seed
+		self.chunk_size = chunk_size
+		self.max_chunks = max_chunks
+		self._epoch = 0
+		self._thread = None
+		self._stop = Event()
+		self._space = Event()# set when the buffer can take a chunk
+		self._lock = Lock()# held while generating (_rng, _last_y)
+		self._rng = None
+		self._last_y = None
+		self._records = deque()
+
+	@property
+	def ready(self) -> int:
+		" Records ready to be popped."
+		return len(self._records)
+
+	def start(self, start_y:int) -> None:
+		""" (Re)starts generation above given height.
+		:param start_y int: y of the base platform.
+		"""
+		self.stop()
+		self._epoch += 1
+		self._records.clear()
+		self._rng = Random(f"{self.seed}:{self._epoch}")
+		self._last_y = start_y
+		self._stop = Event()
+		self._thread = Thread(target=self._work, name="LevelStreamer",
+			args=(self._stop,), daemon=True)
+		self._thread.start()
+
+	def stop(self) -> None:
+		" Stops the worker thread (pending records are dropped)."
+		if self._thread:
+			self._stop.set()
+			self._space.set()
+			self._thread.join()
+			self._thread = None
+
+	def _chunk(self) -> None:
+		" Generates the next chunk into the buffer (lock held)."
+		chunk = generate_chunk(self._rng,self._last_y,self.chunk_size,*self.params)
+		self._last_y = chunk[-1].y
+		self._records.extend(chunk)
+
+	def _work(self, stop:Event) -> None:
+		capacity = (self.max_chunks-1)*self.chunk_size
+		while not stop.is_set():
+			with self._lock:
+				full = len(self._records) > capacity
+				if full: self._space.clear()
+				else: self._chunk()
+			if full: self._space.wait(.05)
+
+	def generate(self, count:int) -> None:
+		""" Generates chunks on the calling thread until count records are
+		ready (next ones of the sequence, as the worker would).
+		:param count int: records needed.
+		"""
+		with self._lock:
+			while len(self._records) < count:
+				self._chunk()
+
+	def pop(self) -> PlatformRecord:
+		" Next platform layout, None if none is ready yet (never waits)."
+		try:
+			record = self._records.popleft()
+		except IndexError:
+			return None
+		if not self._space.is_set() and len(self._records) <= \
+				(self.max_chunks-1)*self.chunk_size:
+			self._space.set()
+		return record
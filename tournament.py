@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+	CopyLeft 2021 Michael Rouves
+
+	This file is part of Pygame-DoodleJump.
+	Pygame-DoodleJump is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+
+	Pygame-DoodleJump is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+	GNU Affero General Public License for more details.
+
+	You should have received a copy of the GNU Affero General Public License
+	along with Pygame-DoodleJump. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+from collections import namedtuple
+from importlib import import_module
+from multiprocessing import Pool, cpu_count
+from time import perf_counter
+
+from inputs import direction_events
+import settings as config
+
+
+# Agent API: agent(game) -> direction to hold (-1: left, 0: none, 1: right)
+# where game is a headless main.Game (read only: game.player, game.lvl...).
+# Agents are given as "module:callable" so pool workers can import them.
+
+EpisodeResult = namedtuple("EpisodeResult","agent seed score frames death_cause")
+
+
+
+def apply_direction(game, direction:int) -> None:
+	""" Feeds the key events turning held direction into given one,
+	like a keyboard would (Game.handle_event).
+	:param direction int: -1 (left), 0 (none) or 1 (right).
+	"""
+	for event in direction_events(game.player._input,direction):
+		game.handle_event(event)
+
+
+def idle(game) -> int:
+	" Example agent: never moves."
+	return 0
+
+
+def greedy(game) -> int:
+	" Example agent: moves toward the next platform to reach."
+	player = game.player
+	bottom = player.rect.bottom
+	if player._velocity.y < 0:# rising: aim for a platform above
+		targets = [p for p in game.lvl.platforms_near(player.rect.inflate(0,400))
+			if p.rect.y < bottom-40]
+		target = max(targets,key=lambda p:p.rect.y,default=None)
+	else:# falling: aim for the platform below
+		targets = [p for p in game.lvl.platforms_near(player.rect.inflate(0,800))
+			if p.rect.y >= bottom]
+		target = min(targets,key=lambda p:p.rect.y,default=None)
+	if target and abs(target.rect.centerx-player.rect.centerx) > 15:
+		return 1 if target.rect.centerx > player.rect.centerx else -1
+	return 0
+
+
+def load_agent(path:str):
+	""" Imports an agent.
+	:param path str: "module:callable" (ex: "tournament:greedy").
+	"""
+	module,_,name = path.partition(":")
+	return getattr(import_module(module),name)
+
+
+def run_episode(agent_path:str, seed:int,
+		max_frames:int=config.TOURNAMENT_MAX_FRAMES, dt:int=1) -> EpisodeResult:
+	""" Plays one headless game until the player dies or the frame cap.
+	:param agent_path str: "module:callable" of the agent.
+	:param seed int: level seed.
+	:param max_frames int: frame cap.
+	:param dt int: frames simulated per step (agent called once per step).
+	"""
+	from main import Game
+	agent = load_agent(agent_path)
+	game = Game(seed=seed,headless=True)
+	while game.steps*dt < max_frames and not game.player.dead:
+		apply_direction(game,agent(game))
+		game._update_loop(dt)
+	cause = "fell" if game.player.dead else "frame_cap"
+	return EpisodeResult(agent_path,seed,game.score,game.steps*dt,cause)
+
+
+def _run_task(task:tuple) -> EpisodeResult:
+	return run_episode(*task)
+
+
+def tournament(agents:list, seeds:list, max_frames:int=config.TOURNAMENT_MAX_FRAMES,
+		workers:int=None, dt:int=1):
+	""" Plays every (agent, seed) episode across a process pool.
+	:param agents list: "module:callable" agent paths.
+	:param seeds list: level seeds.
+	:param workers int: processes (default: one per core).
+	:param dt int: frames simulated per step.
+	:return generator: EpisodeResult, as episodes finish.
+	"""
+	tasks = [(agent,seed,max_frames,dt) for agent in agents for seed in seeds]
+	with Pool(workers or cpu_count()) as pool:
+		yield from pool.imap_unordered(_run_task,tasks)
+
+
+
+
+if __name__ == "__main__":
+	from argparse import ArgumentParser
+	parser = ArgumentParser(description="Headless DoodleJump tournament")
+	parser.add_argument("--agents",nargs="+",
+		default=["tournament:greedy","tournament:idle"],
+		help="agents as module:callable")
+	parser.add_argument("--seeds",type=int,default=32,
+		help="number of seeds per agent (0..N-1)")
+	parser.add_argument("--frames",type=int,default=config.TOURNAMENT_MAX_FRAMES,
+		help="frame cap per episode")
+	parser.add_argument("--workers",type=int,default=None,
+		help="processes (default: one per core)")
+	parser.add_argument("--dt",type=int,default=1,
+		help="frames simulated per step (swept collisions above 1)")
+	args = parser.parse_args()
+
+	start = perf_counter()
+	scores,count = {agent:[] for agent in args.agents},0
+	for result in tournament(args.agents,range(args.seeds),
+			args.frames,args.workers,args.dt):
+		count += 1
+		scores[result.agent].append(result.score)
+		print(f"{result.agent:>20} seed {result.seed:>5}: score {result.score:>5}"
+			f" frames {result.frames:>6} ({result.death_cause})")
+	elapsed = perf_counter()-start
+	for agent,values in scores.items():
+		print(f"{agent:>20}: mean score {sum(values)/max(len(values),1):.1f}")
+	print(f"{count} episodes in {elapsed:.2f} s: {count/elapsed:.1f} episodes/s")
@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+"""
+	CopyLeft 2021 Michael Rouves
+
+	This file is part of Pygame-DoodleJump.
+	Pygame-DoodleJump is free software: you can redistribute it and/or modify
+	it under the terms of the GNU Affero General Public License as published by
+	the Free Software Foundation, either version 3 of the License, or
+	(at your option) any later version.
+
+	Pygame-DoodleJump is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+	GNU Affero General Public License for more details.
+
+	You should have received a copy of the GNU Affero General Public License
+	along with Pygame-DoodleJump. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+from math import copysign
+from pygame.event import Event
+import struct
+
+from camera import Camera
+from player import Player
+from level import Level
+import settings as config
+
+
+# Snapshot format (little endian):
+#	header: magic "DJSS", version (u8), steps, death step, score (i32)
+#	then Camera.STATE, Player.STATE and Level.STATE (see their snapshot())
+MAGIC = b"DJSS"
+VERSION = 1
+HEADER = struct.Struct("<4sBiii")
+
+
+class World:
+	"""
+	A class to represent one game simulation (no window, no user interface).
+
+	Owns its camera, level and player, which only reference each other:
+	any number of worlds can live in one process, each stepped on its own.
+	Game runs one world in the window.
+	"""
+
+	def __init__(self, seed:int=None, streaming:bool=None, layouts=None):
+		"""
+		:param seed int: level generation seed (default: random).
+		:param streaming bool: background level generation
+			(default: config.LEVEL_STREAMING).
+		:param layouts levelgen.LayoutBank: pre-validated level layouts.
+		"""
+		self.camera = Camera()
+		self.lvl = Level(seed,streaming,self.camera,layouts)
+		self.player = Player(
+			config.HALF_XWIN - config.PLAYER_SIZE[0]/2,# X POS
+			config.HALF_YWIN + config.HALF_YWIN/2,#      Y POS
+			*config.PLAYER_SIZE,# SIZE
+			config.PLAYER_COLOR,# COLOR
+			level=self.lvl, camera=self.camera)
+		self.steps = 0# simulation steps done
+		self.death_step = -1
+		self.score = 0
+
+	@property
+	def seed(self) -> int:
+		return self.lvl.seed
+
+	def close(self) -> None:
+		" Stops background work (level streaming), if any."
+		if self.lvl.streamer:
+			self.lvl.streamer.stop()
+
+	def snapshot(self) -> bytes:
+		""" Packs the complete simulation state (deterministic: restoring it
+		then applying the same inputs gives the same game).
+		:return bytes: compact binary state, see restore().
+		"""
+		out = bytearray(HEADER.pack(MAGIC,VERSION,self.steps,
+			self.death_step,self.score))
+		self.camera.snapshot(out)
+		self.player.snapshot(out)
+		self.lvl.snapshot(out)
+		return bytes(out)
+
+	def restore(self, data:bytes) -> None:
+		""" Sets the state of a snapshot, in place (sprites are reused).
+		:param data bytes: a snapshot of this world or of another one.
+		"""
+		magic,version,self.steps,self.death_step,self.score = \
+			HEADER.unpack_from(data)
+		assert magic == MAGIC, "Not a DoodleJump snapshot !"
+		assert version == VERSION, "Unsupported snapshot version !"
+		pos = self.camera.restore(data,HEADER.size)
+		pos = self.player.restore(data,pos)
+		self.lvl.restore(data,pos)
+
+	def reset(self) -> None:
+		" Restarts the game (after player death)."
+		self.camera.reset()
+		self.lvl.reset()
+		self.player.reset()
+		self.death_step = -1
+
+	def handle_event(self, event:Event) -> None:
+		""" Player input (before next update).
+		:param event pygame.Event: key event.
+		"""
+		self.player.handle_event(event)
+
+	def advance(self, steps:int) -> int:
+		""" Event-driven stepping, same result as steps calls to update():
+		frames where the player only moves (no possible contact, no death,
+		level and camera only following) are computed inline by _coast,
+		the others run update(). Inputs must not change meanwhile.
+		:return int: update() calls done (Python-level steps).
+		"""
+		end,calls = self.steps+steps,0
+		while self.steps < end:
+			if self.player.dead:
+				# frozen: nothing changes after the first dead update
+				self.update()
+				calls += 1
+				self.steps = end
+				break
+			self._coast(end-self.steps)
+			if self.steps < end:
+				self.update()
+				calls += 1
+		return calls
+
+	def _coast(self, frames:int) -> int:
+		""" Runs update()'s arithmetic inline (bit-identical) while nothing
+		but motion can happen: stops before a frame where the player may
+		touch a platform or bonus, die, or reach the generated platforms.
+		The level is updated once, like each frame would have.
+		:return int: frames done.
+		"""
+		player,camera,lvl = self.player,self.camera,self.lvl
+		if lvl.streamer or player.swept or not lvl.platforms: return 0
+		# Player.update constants (dt=1)
+		gravity,accel,deccel,input_ = (player.gravity,player.accel,
+			player.deccel,player._input)
+		max_x,max_y = config.PLAYER_MAX_SPEED,config.PLAYER_MAX_FALL_SPEED
+		modulo = config.XWIN-player.rect.width
+		death = config.YWIN*2
+		# anything the player could collide with: platforms, bonuses
+		targets = []
+		for platform in lvl.platforms:
+			if platform.bonus: targets.append(platform.bonus.rect)
+			targets.append(platform.rect)
+		# platforms generated meanwhile are above this (player's top)
+		top_limit = (lvl.platforms.last.rect.y - lvl.distance_min
+			+ lvl.platform_size[1])
+		rect = player.rect.copy()# (Rect rounding of positions)
+		cam = camera.state.copy()
+		x,y = lastpos = rect.topleft
+		vx,vy = player._velocity
+		cam_y,last_cam_y = cam.y,camera.last_y
+		maxheight,center,lerp = camera.maxheight,camera.center,camera.lerp
+		done = 0
+		while done < frames:
+			if y-cam_y > death: break
+			# velocity (Player.update, _fix_velocity)
+			nvy,nvx = vy+gravity,vx
+			if input_:
+				nvx += input_*accel
+			elif nvx:
+				sign = copysign(1,nvx)
+				nvx = round(nvx-sign*deccel)
+				if copysign(1,nvx) != sign: nvx = 0
+			nvy = round(max(min(nvy,max_y),-max_y),2)
+			nvx = round(max(min(nvx,max_x),-max_x),2)
+			# position
+			rect.x = (x+nvx)%modulo
+			rect.y = y+nvy
+			if nvy > .5 and rect.collidelist(targets) >= 0: break
+			if rect.top < top_limit: break
+			lastpos,(x,y),vx,vy = (x,y),rect.topleft,nvx,nvy
+			# camera (Camera.update)
+			if y < maxheight:
+				camera.lastheight,maxheight = maxheight,y
+			last_cam_y = cam_y
+			cam.y = cam_y-((cam_y+center)-maxheight)/lerp
+			cam_y = cam.y
+			done += 1
+		if not done: return 0
+		player.set_motion((x,y),(vx,vy),lastpos)
+		# level: culled with the camera of the last frame's Level.update
+		lvl.update(last_cam_y)
+		camera.maxheight = maxheight
+		camera.last_y = last_cam_y
+		camera.state.y = camera.render_y = cam_y
+		self.steps += done
+		self.score = -cam_y//50
+		return done
+
+	def update(self, dt:float=1.) -> None:
+		""" Advances the simulation by one step.
+		:param dt float: simulated frames (see Player.update).
+		"""
+		self.player.update(dt)
+		self.lvl.update()
+		self.steps += 1
+		if self.player.dead:
+			if self.death_step < 0:
+				self.death_step = self.steps
+			self.camera.freeze()
+		else:
+			self.camera.update(self.player.rect,dt,self.player.peak)
+			self.score = -self.camera.state.y//50
+
+
+
+def _play(world:World, steps:int, inputs, on_step=None) -> None:
+	""" Steps a world with random directions (restarted when dead).
+	:param inputs random.Random: draws the directions.
+	:param on_step callable: on_step(step) after each update.
+	"""
+	from inputs import direction_events
+	for step in range(steps):
+		if world.player.dead: world.reset()
+		if inputs.random() < .05:
+			for event in direction_events(world.player._input,
+					inputs.choice((-1,0,1))):
+				world.handle_event(event)
+		world.update()
+		if on_step: on_step(step)
+
+
+def _first_difference(expected:list, values:list) -> int:
+	" Index of the first value differing from expected, None if same."
+	for i,(a,b) in enumerate(zip(expected,values)):
+		if a != b: return i
+	return None if len(expected) == len(values) else min(map(len,(expected,values)))
+
+
+def check_snapshots(seeds:int=100, steps:int=600) -> list:
+	""" Restores a snapshot taken mid-game into another world and into the
+	same one (rollback), then plays the same inputs in all three: every
+	World.snapshot() must be identical to the original's.
+	:return list: (seed, step, what) of the first mismatch of each seed.
+	"""
+	from random import Random
+	mismatches = []
+	for seed in range(seeds):
+		world = World(seed,streaming=False)
+		_play(world,Random(seed).randrange(50,1000),Random(seed))
+		data = world.snapshot()
+		other = World(seed+seeds,streaming=False)
+		other.update()
+		other.restore(data)
+		if other.snapshot() != data:
+			mismatches.append((seed,0,"restored"))
+			continue
+		expected = []
+		_play(world,steps,Random(-seed),
+			lambda step:expected.append(world.snapshot()))
+		for name,copy in (("other world",other),("rollback",world)):
+			copy.restore(data)
+			played = []
+			_play(copy,steps,Random(-seed),
+				lambda step:played.append(copy.snapshot()))
+			step = _first_difference(expected,played)
+			if step is not None:
+				mismatches.append((seed,step,name))
+				break
+	return mismatches
+
+
+def check_advance(seeds:int=100, steps:int=4000) -> list:
+	""" Plays random inputs held for random durations (1 to 200 steps)
+	with update() each step and with advance() between inputs: World.snapshot()
+	must be identical at every input.
+	:return list: (seed, step, what) of the first mismatch of each seed.
+	"""
+	from random import Random
+	from inputs import direction_events
+	mismatches = []
+	for seed in range(seeds):
+		inputs = Random(seed)
+		stepped,advanced = World(seed,streaming=False),World(seed,streaming=False)
+		while stepped.steps < steps:
+			end = min(stepped.steps+inputs.randint(1,200),steps)
+			while stepped.steps < end: stepped.update()
+			advanced.advance(end-advanced.steps)
+			if stepped.snapshot() != advanced.snapshot():
+				mismatches.append((seed,end,"advance"))
+				break
+			for event in direction_events(stepped.player._input,
+					inputs.choice((-1,0,1))):
+				stepped.handle_event(event)
+				advanced.handle_event(event)
+	return mismatches
+
+
+
+
+if __name__ == "__main__":
+	seeds = 100
+	for name,check in (("snapshot round trips",check_snapshots),
+			("advance against update",check_advance)):
+		mismatches = check(seeds)
+		print(f"{name}: {seeds-len(mismatches)}/{seeds} seeds identical",
+			*(f"seed {seed}: {what} differs at step {step}"
+				for seed,step,what in mismatches),sep="\n")
+		assert not mismatches, f"{name} differ !"